@@ -0,0 +1,85 @@
+"""
+Benchmark token latency of alt text decoding.
+
+Compares the generic eager decoding with dynamic KV cache (previous behaviour) against
+static KV cache and static KV cache compiled with torch.compile.
+
+Usage:
+    python benchmark_decoding.py --model model --image example/image_example.jpg
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent.joinpath("src").resolve()))
+
+from settings import DecodingSettings  # noqa: E402
+from vision import VisionCaptioner, load_rgb_image  # noqa: E402
+
+
+def measure(captioner: VisionCaptioner, images: list, warmup: int, runs: int) -> tuple[float, float]:
+    """
+    Measure average latency of one generate call and of one generated token.
+
+    Args:
+        captioner (VisionCaptioner): Decoding engine to measure.
+        images (list): Batch of images.
+        warmup (int): Number of calls that are not measured.
+        runs (int): Number of measured calls.
+
+    Returns:
+        Tuple of milliseconds per call and milliseconds per token.
+    """
+    for _ in range(warmup):
+        captioner.generate_ids(images)
+
+    elapsed: float = 0.0
+    steps: int = 0
+    for _ in range(runs):
+        if captioner.device.type == "cuda":
+            torch.cuda.synchronize()
+        start: float = time.perf_counter()
+        output_ids: torch.Tensor = captioner.generate_ids(images)
+        if captioner.device.type == "cuda":
+            torch.cuda.synchronize()
+        elapsed += time.perf_counter() - start
+        # First token is decoder start token, it is not generated
+        steps += max(output_ids.shape[1] - 1, 1)
+
+    return elapsed * 1000 / runs, elapsed * 1000 / steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark token latency of alt text decoding")
+    parser.add_argument("--model", type=str, default="model", help="Path to local model directory")
+    parser.add_argument("--image", type=str, default="example/image_example.jpg", help="Image to caption")
+    parser.add_argument("--batch-size", type=int, default=1, help="Number of images in one generate call")
+    parser.add_argument("--max-length", type=int, default=16, help="Maximum length of alt text in tokens")
+    parser.add_argument("--num-beams", type=int, default=1, help="Number of beams")
+    parser.add_argument("--warmup", type=int, default=3, help="Number of calls that are not measured")
+    parser.add_argument("--runs", type=int, default=10, help="Number of measured calls")
+    parser.add_argument("--skip-compile", action="store_true", help="Do not measure torch.compile variant")
+    args = parser.parse_args()
+
+    images: list = [load_rgb_image(args.image)] * args.batch_size
+
+    variants: list[tuple[str, DecodingSettings]] = [
+        ("eager, dynamic cache", DecodingSettings(args.max_length, args.num_beams, False, False)),
+        ("static cache", DecodingSettings(args.max_length, args.num_beams, True, False)),
+    ]
+    if not args.skip_compile:
+        variants.append(("static cache + compile", DecodingSettings(args.max_length, args.num_beams, True, True)))
+
+    print(f"{'variant':<26} {'ms/call':>10} {'ms/token':>10}")
+    for name, settings in variants:
+        captioner: VisionCaptioner = VisionCaptioner(args.model, settings)
+        ms_per_call, ms_per_token = measure(captioner, images, args.warmup, args.runs)
+        print(f"{name:<26} {ms_per_call:>10.2f} {ms_per_token:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import base64
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from transformers import ViTImageProcessor
+
+from settings import BackendSettings, DecodingSettings
+from vision import CaptionBackend, VisionCaptioner, get_vision_captioner
+
+
+class HttpCaptionBackend(CaptionBackend):
+    """
+    Backend sending images to remote caption server over pooled keep-alive connections.
+
+    Every image is sent as separate request `POST {url}` with JSON body
+    `{"image": <base64 JPEG>, "max_length": int, "num_beams": int}` and the server
+    answers `{"alt": str}`. Requests of one batch run concurrently. Failed requests are
+    retried with exponential backoff and when the server stays unavailable the backend
+    falls back to the in-process model for the rest of the run. Images the server rejects
+    are captioned by the in-process model one by one.
+    """
+
+    # Constants
+    RETRIES: int = 3
+    BACKOFF_SECONDS: float = 0.5
+    CONNECT_TIMEOUT: float = 5.0
+    READ_TIMEOUT: float = 60.0
+    RETRY_STATUS_CODES: tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def __init__(self, model_path: str, decoding: DecodingSettings, settings: BackendSettings) -> None:
+        """
+        Create pooled HTTP session.
+
+        Args:
+            model_path (str): Path to Vision model used for image size and local fallback.
+            decoding (DecodingSettings): Settings of the alt text decoding.
+            settings (BackendSettings): Settings of the caption backend.
+        """
+        self.model_path: str = model_path
+        self.decoding: DecodingSettings = decoding
+        self.settings: BackendSettings = settings
+        self.session: requests.Session = requests.Session()
+        adapter: HTTPAdapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=settings.concurrency)
+        self.fallback: Optional[VisionCaptioner] = None
+        self._fallback_lock: threading.Lock = threading.Lock()
+        # Only preprocessor config of the local model is loaded, images are resized to its size before sending
+        feature_extractor: ViTImageProcessor = ViTImageProcessor.from_pretrained(model_path, local_files_only=True)
+        size: Any = feature_extractor.size
+        self._image_size: tuple[int, int] = (int(size["width"]), int(size["height"]))
+
+    @property
+    def image_size(self) -> tuple[int, int]:
+        """
+        Size of images the model takes as input.
+
+        Returns:
+            Tuple of width and height in pixels.
+        """
+        return self._image_size
+
+    def caption(self, images: list[Image.Image]) -> list[str]:
+        """
+        Generate alt texts for batch of images on the remote server.
+
+        Args:
+            images (list[Image.Image]): Images in RGB mode.
+
+        Returns:
+            Alt text for each image in the same order.
+        """
+        if self.fallback is not None:
+            return self.fallback.caption(images)
+        return list(self.executor.map(self._caption_image, images))
+
+    def _caption_image(self, image: Image.Image) -> str:
+        """
+        Send one image to the remote server, retrying with backoff and falling back to local inference.
+
+        Args:
+            image (Image.Image): Image in RGB mode.
+
+        Returns:
+            Alt text for the image.
+        """
+        payload: dict[str, Any] = {
+            "image": self._encode_image(image),
+            "max_length": self.decoding.max_length,
+            "num_beams": self.decoding.num_beams,
+        }
+
+        for attempt in range(self.RETRIES + 1):
+            if self.fallback is not None:
+                break
+            if attempt > 0:
+                time.sleep(self.BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                response: requests.Response = self.session.post(
+                    self.settings.url, json=payload, timeout=(self.CONNECT_TIMEOUT, self.READ_TIMEOUT)
+                )
+            except requests.RequestException as e:
+                print(f"Caption request to {self.settings.url} failed: {e}", file=sys.stderr)
+                continue
+            if response.status_code in self.RETRY_STATUS_CODES:
+                print(f"Caption request to {self.settings.url} failed: HTTP {response.status_code}", file=sys.stderr)
+                continue
+            try:
+                response.raise_for_status()
+                return str(response.json()["alt"]).strip()
+            except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+                # Other errors are not expected to go away with retry, but server is still available
+                print(f"Caption request to {self.settings.url} failed: {e}", file=sys.stderr)
+                return self._caption_locally(image, False)
+
+        return self._caption_locally(image, True)
+
+    def _encode_image(self, image: Image.Image) -> str:
+        """
+        Resize image to model input size and encode it as base64 JPEG.
+
+        Args:
+            image (Image.Image): Image in RGB mode.
+
+        Returns:
+            Base64 encoded JPEG data.
+        """
+        if image.size != self.image_size:
+            image = image.resize(self.image_size, Image.Resampling.BILINEAR)
+        buffer: io.BytesIO = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=95)
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    def _caption_locally(self, image: Image.Image, server_unavailable: bool) -> str:
+        """
+        Generate alt text with the in-process model.
+
+        Args:
+            image (Image.Image): Image in RGB mode.
+            server_unavailable (bool): Switch rest of the run to local inference, otherwise only this image
+                is captioned locally.
+
+        Returns:
+            Alt text for the image.
+        """
+        # In-process model is not safe to load or run from several threads at once
+        with self._fallback_lock:
+            if server_unavailable and self.fallback is None:
+                print("Caption server is unavailable, falling back to local inference", file=sys.stderr)
+                self.fallback = get_vision_captioner(self.model_path, self.decoding)
+            captioner: VisionCaptioner = self.fallback or get_vision_captioner(self.model_path, self.decoding)
+            return captioner.caption([image])[0]
+
+
+def get_caption_backend(model_path: str, decoding: DecodingSettings, settings: BackendSettings) -> CaptionBackend:
+    """
+    Get caption backend for given settings.
+
+    Args:
+        model_path (str): Path to Vision model.
+        decoding (DecodingSettings): Settings of the alt text decoding.
+        settings (BackendSettings): Settings of the caption backend.
+
+    Returns:
+        HTTP backend if URL is set, in-process model otherwise.
+    """
+    if settings.url:
+        return HttpCaptionBackend(model_path, decoding, settings)
+    return get_vision_captioner(model_path, decoding)
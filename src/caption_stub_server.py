@@ -0,0 +1,148 @@
+"""
+Local caption server for testing the HTTP caption backend.
+
+Without --model it answers every request with a caption describing the received image size.
+With --model it serves the in-process Vision model, one request at a time.
+
+Usage:
+    python src/caption_stub_server.py --port 8765 [--model model] [--delay 0.1] [--fail 2]
+"""
+
+import argparse
+import base64
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from PIL import Image
+
+from settings import DecodingSettings
+from vision import VisionCaptioner, get_vision_captioner
+
+
+class CaptionStubServer(ThreadingHTTPServer):
+    """
+    HTTP server answering caption requests of `HttpCaptionBackend`.
+    """
+
+    def __init__(self, address: tuple[str, int], model_path: str, delay: float, fail: int) -> None:
+        """
+        Initialize server.
+
+        Args:
+            address (tuple[str, int]): Host and port to listen on.
+            model_path (str): Path to Vision model. Stub captions are returned if empty.
+            delay (float): Seconds to wait before answering each request.
+            fail (int): Number of first requests answered with HTTP 503 to exercise retries.
+        """
+        super().__init__(address, CaptionRequestHandler)
+        self.model_path: str = model_path
+        self.delay: float = delay
+        self.remaining_failures: int = fail
+        self.lock: threading.Lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        """
+        Check whether current request should fail.
+
+        Returns:
+            True while there are failures left to return.
+        """
+        with self.lock:
+            if self.remaining_failures > 0:
+                self.remaining_failures -= 1
+                return True
+            return False
+
+    def caption(self, image: Image.Image, max_length: int, num_beams: int) -> str:
+        """
+        Generate alt text for the image.
+
+        Args:
+            image (Image.Image): Received image.
+            max_length (int): Maximum length of alt text in tokens.
+            num_beams (int): Number of beams.
+
+        Returns:
+            Alt text of the image.
+        """
+        if not self.model_path:
+            return f"stub caption of {image.width}x{image.height} image"
+
+        # In-process model is not safe to run from several threads at once
+        with self.lock:
+            captioner: VisionCaptioner = get_vision_captioner(self.model_path, DecodingSettings(max_length, num_beams))
+            return captioner.caption([image.convert(mode="RGB")])[0]
+
+
+class CaptionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles `POST` requests with `{"image", "max_length", "num_beams"}` JSON body.
+    """
+
+    # Keep connections alive between requests
+    protocol_version: str = "HTTP/1.1"
+    server: CaptionStubServer
+
+    def do_GET(self) -> None:
+        self._send_json(200, {"status": "ok"})
+
+    def do_POST(self) -> None:
+        length: int = int(self.headers.get("Content-Length", 0))
+        body: bytes = self.rfile.read(length)
+
+        if self.server.delay > 0:
+            time.sleep(self.server.delay)
+        if self.server.should_fail():
+            self._send_json(503, {"error": "simulated failure"})
+            return
+
+        try:
+            request: Any = json.loads(body)
+            image: Image.Image = Image.open(io.BytesIO(base64.b64decode(request["image"])))
+            alt: str = self.server.caption(image, int(request.get("max_length", 16)), int(request.get("num_beams", 1)))
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        self._send_json(200, {"alt": alt})
+
+    def _send_json(self, status: int, data: dict[str, Any]) -> None:
+        """
+        Send JSON response.
+
+        Args:
+            status (int): HTTP status code.
+            data (dict[str, Any]): Response body.
+        """
+        content: bytes = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Requests are not logged to keep test output clean
+        pass
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local caption server for testing the HTTP caption backend")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--model", type=str, default="", help="Serve this Vision model instead of stub captions")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before answering each request")
+    parser.add_argument("--fail", type=int, default=0, help="Number of first requests answered with HTTP 503")
+    args = parser.parse_args(argv)
+
+    server: CaptionStubServer = CaptionStubServer((args.host, args.port), args.model, args.delay, args.fail)
+    print(f"Caption server listening on http://{args.host}:{args.port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import json
+import sys
+from typing import Any, Optional
+
+from pdfixsdk import GetPdfix, Pdfix, PdsStructElement
+from tqdm import tqdm
+
+from exceptions import (
+    MESSAGE_ARG_GENERAL,
+    ArgumentException,
+    PdfixInitializeException,
+)
+from utils_sdk import (
+    FigureInfo,
+    authorize_sdk,
+    get_figure_element,
+    get_figure_info,
+    open_tagged_document,
+    save_document,
+)
+
+CAPTIONS_FORMAT_VERSION: int = 1
+
+
+def write_captions_json(output_path: str, input_path: str, captions: list[tuple[FigureInfo, str]]) -> None:
+    """
+    Write generated alt texts into JSON sidecar.
+    Each figure is keyed by object id of its structure element and page number (1-based).
+
+    Args:
+        output_path (str): Output path for the JSON file.
+        input_path (str): Path to the PDF file the captions were generated for.
+        captions (list[tuple[FigureInfo, str]]): Figures with generated alt texts.
+    """
+    data: dict[str, Any] = {
+        "version": CAPTIONS_FORMAT_VERSION,
+        "input": input_path,
+        "figures": [
+            {"object_id": figure.object_id, "page": figure.page_num + 1, "alt": alt_text}
+            for figure, alt_text in captions
+        ],
+    }
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(data, output_file, ensure_ascii=False, indent=2)
+
+
+def read_captions_json(captions_path: str) -> list[tuple[int, int, str]]:
+    """
+    Read alt texts from JSON sidecar written by `write_captions_json`.
+
+    Args:
+        captions_path (str): Path to the JSON file.
+
+    Returns:
+        List of object id, page number (1-based) and alt text.
+    """
+    try:
+        with open(captions_path, "r", encoding="utf-8") as captions_file:
+            data: Any = json.load(captions_file)
+        return [(int(item["object_id"]), int(item["page"]), str(item["alt"])) for item in data["figures"]]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ArgumentException(f"{MESSAGE_ARG_GENERAL} Invalid captions file {captions_path}: {e}")
+
+
+def apply_captions_to_pdf(
+    input_path: str,
+    captions_path: str,
+    output_path: str,
+    license_name: str,
+    license_key: str,
+    overwrite: bool,
+) -> None:
+    """
+    Set alt texts from JSON sidecar to Figure tags without rendering or running vission.
+
+    Args:
+        input_path (str): Input path to the PDF file or "-" to read it from stdin.
+        captions_path (str): Path to the JSON file with alt texts.
+        output_path (str): Output path for saving the PDF file or "-" to write it to stdout.
+        license_name (str): Pdfix SDK license name.
+        license_key (str): Pdfix SDK license key.
+        overwrite (bool): Overwrite alternate text if already present.
+    """
+    captions: list[tuple[int, int, str]] = read_captions_json(captions_path)
+
+    with tqdm(total=100) as progress_bar:
+        progress_bar.set_description("Initializing")
+
+        pdfix: Optional[Pdfix] = GetPdfix()
+        if pdfix is None:
+            raise PdfixInitializeException()
+
+        authorize_sdk(pdfix, license_name, license_key)
+
+        # Open doc
+        doc, struct_tree, _ = open_tagged_document(pdfix, input_path)
+
+        progress_bar.update(10)
+        progress_bar.set_description("Applying captions")
+
+        for object_id, page, alt_text in captions:
+            elem: Optional[PdsStructElement] = get_figure_element(struct_tree, doc, object_id)
+            figure: Optional[FigureInfo] = get_figure_info(elem) if elem is not None else None
+            if elem is None or figure is None or figure.page_num + 1 != page:
+                print(f"[image_{object_id}] figure on page {page} not found in the document", file=sys.stderr)
+                continue
+            if overwrite or not figure.has_alt:
+                elem.SetAlt(alt_text)
+
+        progress_bar.n = 90
+        progress_bar.set_description("Saving document")
+        progress_bar.refresh()
+
+        save_document(pdfix, doc, output_path)
+        doc.Close()
+
+        progress_bar.n = 100
+        progress_bar.set_description("Done")
+        progress_bar.refresh()
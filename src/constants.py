@@ -4,3 +4,8 @@ DOCKER_REPOSITORY: str = "generate-alternate-text-vision"
 DOCKER_IMAGE: str = f"{DOCKER_NAMESPACE}/{DOCKER_REPOSITORY}"
 IMAGE_FILE_EXT_REGEX: str = r"\.(jpg|jpeg|png|bmp)$"
 SUPPORTED_IMAGE_EXT: str = ".jpg .jpeg .png .bmp"
+STDIO_PATH: str = "-"
+STREAM_CHUNK_SIZE: int = 1 << 20
+UPDATE_CHECK_CACHE_ENV: str = "PDFIX_UPDATE_CHECK_CACHE"
+UPDATE_CHECK_DISABLE_ENV: str = "PDFIX_DISABLE_UPDATE_CHECK"
+UPDATE_CHECK_TIMEOUT: float = 3.0
@@ -0,0 +1,97 @@
+import math
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from settings import CropFilterSettings
+
+# Reasons returned by `classify_crop`
+CROP_BLANK: str = "blank"
+CROP_DECORATIVE: str = "decorative"
+
+# Crops are reduced to at most this size in pixels so measures do not depend on zoom
+ANALYSIS_SIZE: int = 256
+# Difference of neighbouring gray levels that is counted as an edge
+EDGE_THRESHOLD: int = 24
+# Part of each side ignored when measuring flat content, so frames of empty boxes are not counted
+BORDER_RATIO: float = 0.05
+
+
+def classify_figure_size(size: tuple[float, float], settings: CropFilterSettings) -> Optional[str]:
+    """
+    Classify figure as decorative by its size, so it does not even have to be rendered.
+
+    Args:
+        size (tuple[float, float]): Width and height of the figure in PDF points.
+        settings (CropFilterSettings): Thresholds of the classification.
+
+    Returns:
+        `CROP_DECORATIVE` if the figure is too small, None otherwise.
+    """
+    if min(size) < settings.min_size:
+        return CROP_DECORATIVE
+    return None
+
+
+def classify_crop(image: Image.Image, settings: CropFilterSettings) -> Optional[str]:
+    """
+    Classify rendered figure as blank or decorative, so inference can be skipped for it.
+
+    Args:
+        image (Image.Image): Rendered figure.
+        settings (CropFilterSettings): Thresholds of the classification.
+
+    Returns:
+        `CROP_BLANK` or `CROP_DECORATIVE` if inference should be skipped, None otherwise.
+    """
+    gray: Image.Image = image.convert(mode="L")
+    factor: int = math.ceil(max(gray.size) / ANALYSIS_SIZE)
+    if factor > 1:
+        gray = gray.reduce(factor)
+    pixels: np.ndarray = np.asarray(gray, dtype=np.int16)
+
+    if float(pixels.std()) < settings.min_std:
+        return CROP_BLANK
+
+    # Low edge density alone also matches blurred photos and gradients, so flat content is required too
+    inner: np.ndarray = inner_region(pixels)
+    if inner.size == 0:
+        return None
+    if float(inner.std()) < settings.max_decorative_std and edge_density(inner) < settings.min_edge_density:
+        return CROP_DECORATIVE
+
+    return None
+
+
+def inner_region(pixels: np.ndarray) -> np.ndarray:
+    """
+    Part of the crop inside the border, so frames of empty boxes are not measured.
+
+    Args:
+        pixels (np.ndarray): Gray levels as 2D array.
+
+    Returns:
+        Gray levels without the border.
+    """
+    height, width = pixels.shape
+    margin_y: int = max(int(height * BORDER_RATIO), 1)
+    margin_x: int = max(int(width * BORDER_RATIO), 1)
+    return pixels[margin_y : height - margin_y, margin_x : width - margin_x]
+
+
+def edge_density(pixels: np.ndarray) -> float:
+    """
+    Ratio of pixels where gray level changes sharply towards right or bottom neighbour.
+
+    Args:
+        pixels (np.ndarray): Gray levels as 2D array of signed integers.
+
+    Returns:
+        Ratio of edge pixels between 0 and 1.
+    """
+    if pixels.shape[0] < 2 or pixels.shape[1] < 2:
+        return 0.0
+
+    gradient: np.ndarray = np.abs(np.diff(pixels, axis=1))[:-1, :] + np.abs(np.diff(pixels, axis=0))[:, :-1]
+    return float(np.count_nonzero(gradient > EDGE_THRESHOLD)) / gradient.size
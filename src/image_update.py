@@ -1,22 +1,70 @@
 import json
 import os
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional
 
 import requests
 
-from constants import CONFIG_FILE, DOCKER_IMAGE, DOCKER_NAMESPACE, DOCKER_REPOSITORY
+from constants import (
+    CONFIG_FILE,
+    DOCKER_IMAGE,
+    DOCKER_NAMESPACE,
+    DOCKER_REPOSITORY,
+    UPDATE_CHECK_CACHE_ENV,
+    UPDATE_CHECK_DISABLE_ENV,
+    UPDATE_CHECK_TIMEOUT,
+)
 
 
 class DockerImageContainerUpdateChecker:
     """
     A class to check if there is a new Docker image version available.
+
+    The check runs in a daemon thread and never takes longer than `UPDATE_CHECK_TIMEOUT` seconds
+    from its start. Its result is cached for a day in a file given by `PDFIX_UPDATE_CHECK_CACHE`
+    environment variable (defaults to user cache directory) and it can be disabled by setting
+    `PDFIX_DISABLE_UPDATE_CHECK` environment variable to `1`, `true` or `yes`.
     """
 
     # Constants
-    LAST_CHECK_FILE: str = ".local_data.json"
+    LAST_CHECK_FILE: str = "pdfix-generate-alternate-text-vision-update.json"
+
+    def __init__(self) -> None:
+        self.last_check_file: str = self._get_last_check_file()
+        self._thread: Optional[threading.Thread] = None
+        self._deadline: float = 0.0
+
+    @staticmethod
+    def is_disabled() -> bool:
+        """
+        Check whether update check is disabled by environment variable.
+
+        Returns:
+            True if update check should not run.
+        """
+        return os.environ.get(UPDATE_CHECK_DISABLE_ENV, "").strip().lower() in ("1", "true", "yes")
+
+    def start(self) -> None:
+        """
+        Start the update check in background thread unless it is disabled.
+        The thread is a daemon thread, so it never keeps the process alive.
+        """
+        if self.is_disabled():
+            return
+        self._deadline = time.monotonic() + UPDATE_CHECK_TIMEOUT
+        self._thread = threading.Thread(target=self.check_for_image_updates, daemon=True)
+        self._thread.start()
+
+    def finish(self) -> None:
+        """
+        Wait for the update check only for what remains of its time budget.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout=max(self._deadline - time.monotonic(), 0.0))
 
     def check_for_image_updates(self) -> None:
         """
@@ -24,21 +72,35 @@ class DockerImageContainerUpdateChecker:
         If a new version is found, it prints a message with the update command.
         """
         try:
-            if not self._last_check_today():
-                current_version: str = self._get_current_version()
-                latest_version: Optional[str] = self._get_latest_docker_version()
+            checked_today, latest_version = self._read_last_check()
+            if not checked_today:
+                latest_version = self._get_latest_docker_version()
+                # Failed check is also stored so offline runs do not retry it until tomorrow
+                self._update_last_check(latest_version)
 
-                if latest_version and latest_version != current_version:
-                    print(
-                        f"🚀 A new Docker image version ({latest_version}) is available! "
-                        f"Update with: `docker pull {DOCKER_IMAGE}:{latest_version}`"
-                    )
-
-                self._update_last_check()
+            current_version: str = self._get_current_version()
+            if latest_version and latest_version != current_version:
+                print(
+                    f"🚀 A new Docker image version ({latest_version}) is available! "
+                    f"Update with: `docker pull {DOCKER_IMAGE}:{latest_version}`"
+                )
         except Exception:
             # do not propagate any exceptions up
             pass
 
+    def _get_last_check_file(self) -> str:
+        """
+        Get path to the file caching result of the last check.
+
+        Returns:
+            Path from environment variable or path in user cache directory.
+        """
+        cache_file: str = os.environ.get(UPDATE_CHECK_CACHE_ENV, "")
+        if cache_file:
+            return cache_file
+        cache_dir: str = os.environ.get("XDG_CACHE_HOME", "") or os.path.join(Path.home(), ".cache")
+        return os.path.join(cache_dir, self.LAST_CHECK_FILE)
+
     def _get_current_version(self) -> str:
         """
         Read the current version from config.json.
@@ -70,7 +132,7 @@ class DockerImageContainerUpdateChecker:
             f"tags?page_size=50&ordering=last_updated"
         )
         try:
-            response: requests.Response = requests.get(url)
+            response: requests.Response = requests.get(url, timeout=UPDATE_CHECK_TIMEOUT)
             response.raise_for_status()
             data: Any = response.json()
             if isinstance(data, dict) and "results" in data:
@@ -85,29 +147,34 @@ class DockerImageContainerUpdateChecker:
             print(f"Error checking for updates: {e}", file=sys.stderr)
         return None
 
-    def _last_check_today(self) -> bool:
+    def _read_last_check(self) -> tuple[bool, Optional[str]]:
         """
-        Check if the last update check was today by reading last_check.json.
+        Read the result of the last check from the cache file.
 
         Returns:
-            True if the last check was today, False otherwise.
+            Tuple of whether the last check was today and the latest version it found.
         """
-        if os.path.exists(self.LAST_CHECK_FILE):
+        if os.path.exists(self.last_check_file):
             try:
-                with open(self.LAST_CHECK_FILE, "r", encoding="utf-8") as f:
+                with open(self.last_check_file, "r", encoding="utf-8") as f:
                     data: Any = json.load(f)
-                    last_date: str = data.get("last_check", "")
-                    return last_date == datetime.now().strftime("%Y-%m-%d")
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                print(f"Error reading {self.LAST_CHECK_FILE}: {e}", file=sys.stderr)
-        return False
+                    if data.get("last_check", "") == datetime.now().strftime("%Y-%m-%d"):
+                        latest_version: Any = data.get("latest_version")
+                        return True, str(latest_version) if latest_version else None
+            except (json.JSONDecodeError, OSError, AttributeError) as e:
+                print(f"Error reading {self.last_check_file}: {e}", file=sys.stderr)
+        return False, None
 
-    def _update_last_check(self) -> None:
+    def _update_last_check(self, latest_version: Optional[str]) -> None:
         """
-        Store today's date in last_check.json.
+        Store today's date and the latest version into the cache file.
+
+        Args:
+            latest_version (Optional[str]): The latest version of the Docker image, None if the check failed.
         """
         try:
-            with open(self.LAST_CHECK_FILE, "w", encoding="utf-8") as f:
-                json.dump({"last_check": datetime.now().strftime("%Y-%m-%d")}, f)
+            os.makedirs(os.path.dirname(os.path.abspath(self.last_check_file)), exist_ok=True)
+            with open(self.last_check_file, "w", encoding="utf-8") as f:
+                json.dump({"last_check": datetime.now().strftime("%Y-%m-%d"), "latest_version": latest_version}, f)
         except Exception as e:
-            print(f"Error writing {self.LAST_CHECK_FILE}: {e}", file=sys.stderr)
+            print(f"Error writing {self.last_check_file}: {e}", file=sys.stderr)
@@ -1,13 +1,14 @@
 import argparse
+import glob
 import os
 import re
 import sys
-import threading
 import traceback
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
-from constants import CONFIG_FILE, IMAGE_FILE_EXT_REGEX, SUPPORTED_IMAGE_EXT
+from captions_sidecar import apply_captions_to_pdf
+from constants import CONFIG_FILE, IMAGE_FILE_EXT_REGEX, STDIO_PATH, SUPPORTED_IMAGE_EXT
 from exceptions import (
     EC_ARG_GENERAL,
     MESSAGE_ARG_GENERAL,
@@ -17,8 +18,9 @@ from exceptions import (
     ExpectedException,
 )
 from image_update import DockerImageContainerUpdateChecker
-from process_image import generate_alt_text_into_txt
-from process_pdf import generate_alt_texts_in_pdf
+from memory_budget import parse_memory_size
+from settings import BackendSettings, CropFilterSettings, DecodingSettings
+from utils_sdk import PdfStdout
 
 
 def str2bool(value: Any) -> bool:
@@ -58,10 +60,92 @@ def set_arguments(
     """
     for name in names:
         match name:
+            case "batch_size":
+                parser.add_argument(
+                    "--batch-size",
+                    type=int,
+                    default=None,
+                    help="Number of images captioned at once"
+                    " (default: --caption-concurrency with --caption-url, 1 otherwise).",
+                )
+            case "caption_concurrency":
+                parser.add_argument(
+                    "--caption-concurrency",
+                    type=int,
+                    default=4,
+                    help="Number of concurrent requests to the caption server (default: 4).",
+                )
+            case "blank_alt":
+                parser.add_argument(
+                    "--blank-alt",
+                    type=str,
+                    default="",
+                    help="Alt text set to blank and decorative figures. They are left without alt text if empty.",
+                )
+            case "blank_max_decorative_std":
+                parser.add_argument(
+                    "--blank-max-decorative-std",
+                    type=float,
+                    default=16.0,
+                    help="Figures with low edge density are decorative only when standard deviation of their"
+                    " gray levels is below this value (default: 16).",
+                )
+            case "blank_min_edge_density":
+                parser.add_argument(
+                    "--blank-min-edge-density",
+                    type=float,
+                    default=0.005,
+                    help="Flat figures with lower ratio of edge pixels are decorative (default: 0.005).",
+                )
+            case "blank_min_size":
+                parser.add_argument(
+                    "--blank-min-size",
+                    type=float,
+                    default=8.0,
+                    help="Figures with shorter side below this size in PDF points are decorative (default: 8).",
+                )
+            case "blank_min_std":
+                parser.add_argument(
+                    "--blank-min-std",
+                    type=float,
+                    default=3.0,
+                    help="Figures with lower standard deviation of gray levels are blank (default: 3).",
+                )
+            case "caption_url":
+                parser.add_argument(
+                    "--caption-url",
+                    type=str,
+                    default="",
+                    help="URL of remote caption server. Local model is used if not provided or server is unavailable.",
+                )
+            case "captions":
+                parser.add_argument(
+                    "--captions", type=str, required=True, help="JSON file with captions from extract-captions"
+                )
+            case "compile":
+                parser.add_argument(
+                    "--compile",
+                    type=str2bool,
+                    default=False,
+                    help="Compile the decoder with torch.compile. Requires static cache (default: false).",
+                )
             case "input":
-                parser.add_argument("--input", "-i", type=str, required=True, help="The input PDF file")
+                parser.add_argument(
+                    "--input", "-i", type=str, required=True, help='The input PDF file or "-" to read it from stdin'
+                )
             case "key":
                 parser.add_argument("--key", type=str, default="", nargs="?", help="PDFix license key")
+            case "max_length":
+                parser.add_argument(
+                    "--max-length", type=int, default=16, help="Maximum length of alt text in tokens (default: 16)."
+                )
+            case "max_memory":
+                parser.add_argument(
+                    "--max-memory",
+                    type=parse_memory_size,
+                    default=None,
+                    help="Memory limit, e.g. 2g or 512m. Processing adapts to stay under it (default: no limit).",
+                )
             case "model":
                 parser.add_argument(
                     "--model",
@@ -71,6 +155,10 @@ def set_arguments(
                 )
             case "name":
                 parser.add_argument("--name", type=str, default="", nargs="?", help="PDFix license name")
+            case "num_beams":
+                parser.add_argument(
+                    "--num-beams", type=int, default=1, help="Number of beams for beam search (default: 1 = greedy)."
+                )
             case "output":
                 parser.add_argument("--output", "-o", type=str, required=required_output, help=output_help)
             case "overwrite":
@@ -80,6 +168,35 @@ def set_arguments(
                     default=False,
                     help="Overwrite alternate text if already present in the tag",
                 )
+            case "skip_blank":
+                parser.add_argument(
+                    "--skip-blank",
+                    type=str2bool,
+                    default=True,
+                    help="Skip inference for blank and decorative figures in PDF mode (default: true).",
+                )
+            case "static_cache":
+                parser.add_argument(
+                    "--static-cache",
+                    type=str2bool,
+                    default=True,
+                    help="Preallocate static KV cache reused between images (default: true).",
+                )
+            case "time_budget":
+                parser.add_argument(
+                    "--time-budget",
+                    type=float,
+                    default=None,
+                    help="Seconds to process the PDF in. Most valuable figures are captioned first and the rest"
+                    " is left uncaptioned when time runs out (default: no limit).",
+                )
+            case "workers":
+                parser.add_argument(
+                    "--workers",
+                    type=int,
+                    default=min(os.cpu_count() or 1, 8),
+                    help="Number of threads decoding images in JSONL mode (default: number of CPUs, at most 8).",
+                )
             case "zoom":
                 parser.add_argument(
                     "--zoom", type=float, default=2.0, help="Zoom level for the PDF page rendering (default: 2.0)."
@@ -108,8 +225,129 @@ def get_pdfix_config(path: str) -> None:
                 out.write(file.read())
 
 
+def get_inference_settings(args) -> tuple[DecodingSettings, BackendSettings, int]:
+    """
+    Validate inference arguments and create settings from them.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments.
+
+    Returns:
+        Tuple of decoding settings, caption backend settings and batch size.
+    """
+    # Requests to caption server run concurrently only within one batch
+    batch_size: int = args.batch_size
+    if batch_size is None:
+        batch_size = args.caption_concurrency if args.caption_url else 1
+    if min(args.max_length, args.num_beams, batch_size, args.caption_concurrency) < 1:
+        raise ArgumentException(
+            f"{MESSAGE_ARG_GENERAL} --max-length, --num-beams, --batch-size and --caption-concurrency must be positive."
+        )
+    if args.time_budget is not None and args.time_budget <= 0:
+        raise ArgumentException(f"{MESSAGE_ARG_GENERAL} --time-budget must be positive.")
+    if args.compile and not args.static_cache:
+        raise ArgumentException(f"{MESSAGE_ARG_GENERAL} --compile requires --static-cache true.")
+    decoding: DecodingSettings = DecodingSettings(args.max_length, args.num_beams, args.static_cache, args.compile)
+    backend: BackendSettings = BackendSettings(args.caption_url, args.caption_concurrency)
+    return decoding, backend, batch_size
+
+
+def get_crop_filter_settings(args) -> CropFilterSettings:
+    """
+    Validate pre-filter arguments and create settings from them.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments.
+
+    Returns:
+        Settings of the pre-filter skipping blank and decorative figures.
+    """
+    if min(args.blank_min_size, args.blank_min_std, args.blank_min_edge_density, args.blank_max_decorative_std) < 0:
+        raise ArgumentException(
+            f"{MESSAGE_ARG_GENERAL} --blank-min-size, --blank-min-std, --blank-min-edge-density"
+            " and --blank-max-decorative-std must not be negative."
+        )
+    return CropFilterSettings(
+        args.skip_blank,
+        args.blank_min_size,
+        args.blank_min_std,
+        args.blank_min_edge_density,
+        args.blank_max_decorative_std,
+        args.blank_alt,
+    )
+
+
 def run_generate_alt_text_subcommand(args) -> None:
-    generate_alt_text(args.input, args.output, args.name, args.key, args.overwrite, args.zoom, args.model)
+    decoding, backend, batch_size = get_inference_settings(args)
+    if args.workers < 1:
+        raise ArgumentException(f"{MESSAGE_ARG_GENERAL} --workers must be positive.")
+    generate_alt_text(
+        args.input,
+        args.output,
+        args.name,
+        args.key,
+        args.overwrite,
+        args.zoom,
+        args.model,
+        decoding,
+        batch_size,
+        args.max_memory,
+        args.workers,
+        backend,
+        args.time_budget,
+        get_crop_filter_settings(args),
+    )
+
+
+def run_extract_captions_subcommand(args) -> None:
+    decoding, backend, batch_size = get_inference_settings(args)
+    if args.input != STDIO_PATH and not os.path.isfile(args.input):
+        raise ArgumentInputMissingException(args.input)
+    if not is_pdf_path(args.input) or not args.output.lower().endswith(".json"):
+        raise ArgumentInputOutputNotAllowedException()
+
+    # Import here so that commands without inference do not load torch
+    from process_pdf import extract_captions_from_pdf
+
+    extract_captions_from_pdf(
+        args.input,
+        args.output,
+        args.name,
+        args.key,
+        args.overwrite,
+        args.zoom,
+        args.model,
+        decoding,
+        batch_size,
+        args.max_memory,
+        backend,
+        args.time_budget,
+        get_crop_filter_settings(args),
+    )
+
+
+def run_apply_captions_subcommand(args) -> None:
+    if args.input != STDIO_PATH and not os.path.isfile(args.input):
+        raise ArgumentInputMissingException(args.input)
+    if not os.path.isfile(args.captions):
+        raise ArgumentInputMissingException(args.captions)
+    if not is_pdf_path(args.input) or not is_pdf_path(args.output):
+        raise ArgumentInputOutputNotAllowedException()
+
+    apply_captions_to_pdf(args.input, args.captions, args.output, args.name, args.key, args.overwrite)
+
+
+def is_pdf_path(path: str) -> bool:
+    """
+    Check whether path points to PDF file or to stdin/stdout ("-") streaming PDF file.
+
+    Args:
+        path (str): Input or output path.
+
+    Returns:
+        True if PDF file is read from or written to the path.
+    """
+    return path == STDIO_PATH or path.lower().endswith(".pdf")
 
 
 def generate_alt_text(
@@ -120,26 +358,65 @@ def generate_alt_text(
     overwrite: bool,
     zoom: float,
     model_path: str,
+    decoding: DecodingSettings,
+    batch_size: int,
+    max_memory: Optional[int],
+    workers: int,
+    backend: BackendSettings,
+    time_budget: Optional[float],
+    crop_filter: CropFilterSettings,
 ) -> None:
     """
     Run image detect and use vission to generate alternate text description for images.
 
     Args:
-        input_file (str): Path to PDF or image.
-        output_file (str): Path to PDF or TXT.
+        input_file (str): Path to PDF or image, "-" for PDF on stdin. Directory, glob pattern or "-" (stdin list)
+            in JSONL mode.
+        output_file (str): Path to PDF, TXT or JSONL, "-" for PDF on stdout.
         license_name (str): Name used in authorization in PDFix-SDK.
         license_key (str): Key used in authorization in PDFix-SDK.
         overwrite (bool): Overwrite alternate text if already present.
         zoom (float): Zoom level for rendering the page.
         model_path (str): Path to Vision model. Default value is "model".
+        decoding (DecodingSettings): Settings of the alt text decoding.
+        batch_size (int): Number of images captioned at once in PDF and JSONL mode.
+        max_memory (Optional[int]): Memory limit in bytes for PDF mode. No limit if None.
+        workers (int): Number of threads decoding images in JSONL mode.
+        backend (BackendSettings): Settings of the caption backend.
+        time_budget (Optional[float]): Seconds to process the PDF in. No limit if None.
+        crop_filter (CropFilterSettings): Settings of the pre-filter skipping blank and decorative figures in PDF mode.
     """
-    if not os.path.isfile(input_file):
+    # Import here so that commands without inference do not load torch
+    from process_image import generate_alt_text_into_txt, generate_alt_texts_into_jsonl
+    from process_pdf import generate_alt_texts_in_pdf
+
+    if output_file.lower().endswith(".jsonl"):
+        if input_file != STDIO_PATH and not os.path.exists(input_file) and not glob.has_magic(input_file):
+            raise ArgumentInputMissingException(input_file)
+        generate_alt_texts_into_jsonl(input_file, output_file, model_path, decoding, batch_size, workers, backend)
+        return
+
+    if input_file != STDIO_PATH and not os.path.isfile(input_file):
         raise ArgumentInputMissingException(input_file)
 
-    if input_file.lower().endswith(".pdf") and output_file.lower().endswith(".pdf"):
-        generate_alt_texts_in_pdf(input_file, output_file, license_name, license_key, overwrite, zoom, model_path)
+    if is_pdf_path(input_file) and is_pdf_path(output_file):
+        generate_alt_texts_in_pdf(
+            input_file,
+            output_file,
+            license_name,
+            license_key,
+            overwrite,
+            zoom,
+            model_path,
+            decoding,
+            batch_size,
+            max_memory,
+            backend,
+            time_budget,
+            crop_filter,
+        )
     elif re.search(IMAGE_FILE_EXT_REGEX, input_file, re.IGNORECASE) and output_file.lower().endswith(".txt"):
-        generate_alt_text_into_txt(input_file, output_file, model_path)
+        generate_alt_text_into_txt(input_file, output_file, model_path, decoding, backend)
     else:
         raise ArgumentInputOutputNotAllowedException()
 
@@ -166,18 +443,92 @@ def main() -> None:
 
     # Generate alternate text images subparser
     generate_alt_text_help = "Run alternate text description."
-    generate_alt_text_help += " Runs in 2 modes. First mode is PDF -> PDF."
+    generate_alt_text_help += " Runs in 3 modes. First mode is PDF -> PDF."
     generate_alt_text_help += " Second mode is image file -> TXT."
+    generate_alt_text_help += " Third mode is directory, glob pattern or stdin list (-) of images -> JSONL."
     generate_alt_text_help += f" Allowed image types: {SUPPORTED_IMAGE_EXT}"
     generate_alt_text_subparser = subparsers.add_parser("generate-alt-text", help=generate_alt_text_help)
     set_arguments(
         generate_alt_text_subparser,
-        ["name", "key", "input", "output", "overwrite", "zoom", "model"],
+        [
+            "name",
+            "key",
+            "input",
+            "output",
+            "overwrite",
+            "zoom",
+            "model",
+            "max_length",
+            "num_beams",
+            "static_cache",
+            "compile",
+            "batch_size",
+            "max_memory",
+            "workers",
+            "caption_url",
+            "caption_concurrency",
+            "time_budget",
+            "skip_blank",
+            "blank_alt",
+            "blank_min_size",
+            "blank_min_std",
+            "blank_min_edge_density",
+            "blank_max_decorative_std",
+        ],
         True,
-        "The output PDF or TXT file",
+        "The output PDF, TXT or JSONL file",
     )
     generate_alt_text_subparser.set_defaults(func=run_generate_alt_text_subcommand)
 
+    # Extract captions subparser
+    extract_captions_subparser = subparsers.add_parser(
+        "extract-captions",
+        help="Generate alternate text for Figure tags into JSON file (PDF -> JSON). The PDF is not saved.",
+    )
+    set_arguments(
+        extract_captions_subparser,
+        [
+            "name",
+            "key",
+            "input",
+            "output",
+            "overwrite",
+            "zoom",
+            "model",
+            "max_length",
+            "num_beams",
+            "static_cache",
+            "compile",
+            "batch_size",
+            "max_memory",
+            "caption_url",
+            "caption_concurrency",
+            "time_budget",
+            "skip_blank",
+            "blank_alt",
+            "blank_min_size",
+            "blank_min_std",
+            "blank_min_edge_density",
+            "blank_max_decorative_std",
+        ],
+        True,
+        "The output JSON file",
+    )
+    extract_captions_subparser.set_defaults(func=run_extract_captions_subcommand)
+
+    # Apply captions subparser
+    apply_captions_subparser = subparsers.add_parser(
+        "apply-captions",
+        help="Set alternate text from JSON file of extract-captions to Figure tags (PDF + JSON -> PDF).",
+    )
+    set_arguments(
+        apply_captions_subparser,
+        ["name", "key", "input", "captions", "output", "overwrite"],
+        True,
+        "The output PDF file",
+    )
+    apply_captions_subparser.set_defaults(func=run_apply_captions_subcommand)
+
     # Parse arguments
     try:
         args = parser.parse_args()
@@ -196,11 +547,14 @@ def main() -> None:
         sys.exit(1)
 
     if hasattr(args, "func"):
+        if getattr(args, "output", None) == STDIO_PATH:
+            # stdout carries only the PDF, all messages go to stderr
+            PdfStdout.reserve()
+
         # Check for updates only when help is not checked
         update_checker = DockerImageContainerUpdateChecker()
         # Check it in separate thread not to be delayed when there is slow or no internet connection
-        update_thread = threading.Thread(target=update_checker.check_for_image_updates)
-        update_thread.start()
+        update_checker.start()
 
         # Run subcommand
         try:
@@ -213,8 +567,8 @@ def main() -> None:
             print(f"Failed to run the program: {e}", file=sys.stderr)
             sys.exit(1)
         finally:
-            # Make sure to let update thread finish before exiting
-            update_thread.join()
+            # Let update thread finish only within its time budget
+            update_checker.finish()
     else:
         parser.print_help()
 
@@ -0,0 +1,123 @@
+import gc
+import os
+import re
+import resource
+import sys
+from typing import Optional
+
+from exceptions import MESSAGE_ARG_GENERAL, ArgumentException
+
+MEMORY_SIZE_REGEX: str = r"^(\d+(?:\.\d+)?)\s*([bkmg]?)b?$"
+MEMORY_SIZE_UNITS: dict[str, int] = {"": 1, "b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+
+
+def parse_memory_size(value: str) -> int:
+    """
+    Helper function to convert memory size argument to bytes.
+    Accepts the same format as `docker run --memory`, e.g. "2g", "512m" or "1073741824".
+
+    Args:
+        value (str): Memory size with optional unit suffix (b, k, m, g).
+
+    Returns:
+        Memory size in bytes.
+    """
+    match: Optional[re.Match[str]] = re.match(MEMORY_SIZE_REGEX, value.strip().lower())
+    if match is None or float(match.group(1)) <= 0:
+        raise ArgumentException(f"{MESSAGE_ARG_GENERAL} Memory size expected, e.g. 2g or 512m.")
+    return int(float(match.group(1)) * MEMORY_SIZE_UNITS[match.group(2)])
+
+
+def get_rss_bytes() -> int:
+    """
+    Get resident set size of the current process.
+
+    Returns:
+        Current RSS in bytes (peak RSS on systems without /proc).
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class MemoryBudget:
+    """
+    Tracks RSS of the process and adapts processing to stay under the memory limit.
+
+    Between the soft limit and the limit, garbage is collected first, then each check halves the batch size
+    and then the maximum number of pixels of a rendered crop. When RSS reaches the limit even after garbage
+    collection, batch size and crop size drop to their minimum at once and the budget is exhausted, so no
+    further inference starts.
+    """
+
+    # Constants
+    SOFT_LIMIT_RATIO: float = 0.85
+    # Share of the limit rendered crops of one batch may take
+    CROP_LIMIT_RATIO: float = 0.02
+    # Rendered ARGB bitmap, its encoded copy and decoded RGB image are held at once
+    BYTES_PER_PIXEL: int = 12
+    MIN_CROP_PIXELS: int = 512 * 512
+
+    def __init__(self, limit_bytes: Optional[int], batch_size: int) -> None:
+        """
+        Initialize budget and derive maximum crop size from the limit.
+
+        Args:
+            limit_bytes (Optional[int]): Memory limit in bytes. No limit if None.
+            batch_size (int): Initial number of images captioned at once.
+        """
+        self.limit_bytes: Optional[int] = limit_bytes
+        self.batch_size: int = batch_size
+        self.max_crop_pixels: Optional[int] = None
+        self.exhausted: bool = False
+        if limit_bytes is not None:
+            crop_bytes: int = int(limit_bytes * self.CROP_LIMIT_RATIO) // batch_size
+            self.max_crop_pixels = max(crop_bytes // self.BYTES_PER_PIXEL, self.MIN_CROP_PIXELS)
+
+    def check(self) -> bool:
+        """
+        Compare current RSS with the limit and adapt batch size and crop size when needed.
+
+        Returns:
+            True if processing may continue, False if the budget is exhausted.
+        """
+        if self.limit_bytes is None or self.exhausted:
+            return not self.exhausted
+
+        soft_limit: float = self.limit_bytes * self.SOFT_LIMIT_RATIO
+        if get_rss_bytes() < soft_limit:
+            return True
+
+        gc.collect()
+        rss: int = get_rss_bytes()
+        if rss < soft_limit:
+            return True
+
+        if rss >= self.limit_bytes:
+            # Stepping down one batch at a time would keep running over the limit
+            self.batch_size = 1
+            self.max_crop_pixels = self.MIN_CROP_PIXELS
+            self.exhausted = True
+            print(
+                f"Memory usage {rss >> 20} MB reached the limit {self.limit_bytes >> 20} MB, "
+                "remaining images are left without alternate text",
+                file=sys.stderr,
+            )
+        elif self.batch_size > 1:
+            self.batch_size = max(self.batch_size // 2, 1)
+            print(
+                f"Memory usage {rss >> 20} MB is close to the limit, lowering batch size to {self.batch_size}",
+                file=sys.stderr,
+            )
+        elif self.max_crop_pixels is not None and self.max_crop_pixels > self.MIN_CROP_PIXELS:
+            self.max_crop_pixels = max(self.max_crop_pixels // 2, self.MIN_CROP_PIXELS)
+            print(
+                f"Memory usage {rss >> 20} MB is close to the limit, lowering crop size to {self.max_crop_pixels} px",
+                file=sys.stderr,
+            )
+
+        return not self.exhausted
@@ -1,4 +1,5 @@
 import ctypes
+import math
 from typing import Optional
 
 from pdfixsdk import (
@@ -20,7 +21,29 @@ from pdfixsdk import (
 from exceptions import PdfixFailedToRenderException
 
 
-def render_part_of_page(pdfix: Pdfix, doc: PdfDoc, page_num: int, bbox: PdfRect, zoom: float) -> bytearray:
+def limit_zoom(bbox: PdfRect, zoom: float, max_pixels: Optional[int]) -> float:
+    """
+    Lower zoom level so the rendered bounding box does not exceed maximum number of pixels.
+
+    Args:
+        bbox (PdfRect): Bounding box.
+        zoom (float): Requested zoom level.
+        max_pixels (Optional[int]): Maximum number of pixels of rendered image. No limit if None.
+
+    Returns:
+        Zoom level to render at.
+    """
+    if max_pixels is None:
+        return zoom
+    pixels: float = abs(bbox.right - bbox.left) * abs(bbox.top - bbox.bottom) * zoom * zoom
+    if pixels <= max_pixels:
+        return zoom
+    return zoom * math.sqrt(max_pixels / pixels)
+
+
+def render_part_of_page(
+    pdfix: Pdfix, doc: PdfDoc, page_num: int, bbox: PdfRect, zoom: float, max_pixels: Optional[int] = None
+) -> bytearray:
     """
     Render part of PDF page into image.
 
@@ -30,10 +53,13 @@ def render_part_of_page(pdfix: Pdfix, doc: PdfDoc, page_num: int, bbox: PdfRect,
         page_num (int): Page number.
         bbox (PdfRect): Bounding box.
         zoom (float): Render at zoom level.
+        max_pixels (Optional[int]): Lower the zoom level if rendered image would exceed this number of pixels.
 
     Returns:
         Rendered image data in bytearray.
     """
+    zoom = limit_zoom(bbox, zoom, max_pixels)
+
     page: Optional[PdfPage] = doc.AcquirePage(page_num)
     if page is None:
         raise PdfixFailedToRenderException(pdfix, "Unable to acquire the page")
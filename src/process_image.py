@@ -1,9 +1,27 @@
+import glob
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterator, TextIO
+
+from PIL import Image
 from tqdm import tqdm
 
-from vision import generate_alt_text_description
+from caption_backend import get_caption_backend
+from constants import IMAGE_FILE_EXT_REGEX, STDIO_PATH
+from settings import BackendSettings, DecodingSettings
+from vision import CaptionBackend, load_resized_rgb_image, load_rgb_image
+
+# Number of batches that are decoded ahead of the model
+PREFETCH_BATCHES: int = 2
 
 
-def generate_alt_text_into_txt(input_path: str, output_path: str, model_path: str) -> None:
+def generate_alt_text_into_txt(
+    input_path: str, output_path: str, model_path: str, decoding: DecodingSettings, backend: BackendSettings
+) -> None:
     """
     For input image file run vission generate alt text and save it to output file.
 
@@ -11,11 +29,14 @@ def generate_alt_text_into_txt(input_path: str, output_path: str, model_path: st
         input_path (str): Input path to the image file.
         output_path (str): Output path for saving the TXT file.
         model_path (str): Path to Vision model. Default value is "model".
+        decoding (DecodingSettings): Settings of the alt text decoding.
+        backend (BackendSettings): Settings of the caption backend.
     """
     with tqdm(total=100) as progress_bar:
         progress_bar.set_description("Processing")
 
-        response: list[str] = generate_alt_text_description(input_path, model_path)
+        captioner: CaptionBackend = get_caption_backend(model_path, decoding, backend)
+        response: list[str] = captioner.caption([load_rgb_image(input_path)])
         alt_text_by_vission: str = response[0]
 
         with open(output_path, "w", encoding="utf-8") as output_file:
@@ -24,3 +45,185 @@ def generate_alt_text_into_txt(input_path: str, output_path: str, model_path: st
         progress_bar.n = 100
         progress_bar.set_description("Done")
         progress_bar.refresh()
+
+
+def generate_alt_texts_into_jsonl(
+    input_pattern: str,
+    output_path: str,
+    model_path: str,
+    decoding: DecodingSettings,
+    batch_size: int,
+    workers: int,
+    backend: BackendSettings,
+) -> None:
+    """
+    For all images in a directory, matching a glob pattern or listed on stdin run vission generate alt text
+    and stream `{"path", "alt"}` records into JSONL file.
+
+    Images are decoded and resized on a thread pool while the model captions previous batch. Records are
+    written in input order as batches complete. Images already present in the output file are skipped,
+    so interrupted run can be resumed with the same command.
+
+    Args:
+        input_pattern (str): Directory, glob pattern or "-" to read image paths from stdin (one per line).
+        output_path (str): Output path for the JSONL file.
+        model_path (str): Path to Vision model. Default value is "model".
+        decoding (DecodingSettings): Settings of the alt text decoding.
+        batch_size (int): Number of images captioned at once.
+        workers (int): Number of threads decoding images.
+        backend (BackendSettings): Settings of the caption backend.
+    """
+    done_paths: set[str] = read_captioned_paths(output_path)
+    captioner: CaptionBackend = get_caption_backend(model_path, decoding, backend)
+
+    with (
+        tqdm(unit="img") as progress_bar,
+        ThreadPoolExecutor(max_workers=workers) as executor,
+        open(output_path, "a", encoding="utf-8") as output_file,
+    ):
+        progress_bar.set_description("Processing")
+        pending: deque[tuple[list[str], list[Future[Image.Image]]]] = deque()
+
+        for paths in iterate_batches(iterate_image_paths(input_pattern, done_paths), batch_size):
+            futures: list[Future[Image.Image]] = [
+                executor.submit(load_resized_rgb_image, path, captioner.image_size) for path in paths
+            ]
+            pending.append((paths, futures))
+            if len(pending) > PREFETCH_BATCHES:
+                progress_bar.update(write_jsonl_batch(captioner, output_file, *pending.popleft()))
+
+        while pending:
+            progress_bar.update(write_jsonl_batch(captioner, output_file, *pending.popleft()))
+
+        progress_bar.set_description("Done")
+        progress_bar.refresh()
+
+
+def write_jsonl_batch(
+    captioner: CaptionBackend, output_file: TextIO, paths: list[str], futures: list[Future[Image.Image]]
+) -> int:
+    """
+    Caption batch of decoded images and write their records into JSONL file.
+    Images that failed to load are reported and left out, so they are tried again on resume.
+
+    Args:
+        captioner (CaptionBackend): Caption backend.
+        output_file (TextIO): Opened JSONL file.
+        paths (list[str]): Paths to images in the batch.
+        futures (list[Future[Image.Image]]): Decoded images in the same order as paths.
+
+    Returns:
+        Number of processed paths.
+    """
+    images: list[Image.Image] = []
+    loaded_paths: list[str] = []
+    for path, future in zip(paths, futures):
+        try:
+            images.append(future.result())
+            loaded_paths.append(path)
+        except Exception as e:
+            print(f"[{path}] failed to load image: {e}", file=sys.stderr)
+
+    if len(images) > 0:
+        alt_texts: list[str] = captioner.caption(images)
+        for path, alt_text_by_vission in zip(loaded_paths, alt_texts):
+            output_file.write(json.dumps({"path": path, "alt": alt_text_by_vission}, ensure_ascii=False) + "\n")
+        output_file.flush()
+
+    return len(paths)
+
+
+def iterate_image_paths(input_pattern: str, skip_paths: set[str]) -> Iterator[str]:
+    """
+    Iterate over image paths in deterministic order.
+    Directory is walked recursively in sorted order, glob matches are sorted and stdin keeps its order.
+
+    Args:
+        input_pattern (str): Directory, glob pattern or "-" to read image paths from stdin (one per line).
+        skip_paths (set[str]): Paths that are not returned.
+
+    Yields:
+        Paths to supported image files.
+    """
+    paths: Iterator[str]
+    if input_pattern == STDIO_PATH:
+        paths = (line.strip() for line in sys.stdin if line.strip())
+    elif os.path.isdir(input_pattern):
+        paths = iterate_directory(input_pattern)
+    elif glob.has_magic(input_pattern):
+        paths = iter(sorted(glob.glob(input_pattern, recursive=True)))
+    else:
+        paths = iter([input_pattern])
+
+    for path in paths:
+        if path not in skip_paths and re.search(IMAGE_FILE_EXT_REGEX, path, re.IGNORECASE):
+            yield path
+
+
+def iterate_directory(directory: str) -> Iterator[str]:
+    """
+    Recursively walk directory in sorted order.
+
+    Args:
+        directory (str): Directory to walk.
+
+    Yields:
+        Paths to files.
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+
+def iterate_batches(paths: Iterator[str], batch_size: int) -> Iterator[list[str]]:
+    """
+    Group paths into batches.
+
+    Args:
+        paths (Iterator[str]): Paths to group.
+        batch_size (int): Maximum number of paths in one batch.
+
+    Yields:
+        Lists of paths.
+    """
+    batch: list[str] = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def read_captioned_paths(output_path: str) -> set[str]:
+    """
+    Read paths already present in the JSONL output of a previous run.
+    Incomplete last record of an interrupted run is removed from the file.
+
+    Args:
+        output_path (str): Path to the JSONL file.
+
+    Returns:
+        Set of already captioned image paths.
+    """
+    done_paths: set[str] = set()
+    if not os.path.isfile(output_path):
+        return done_paths
+
+    with open(output_path, "rb+") as output_file:
+        valid_size: int = 0
+        for line in output_file:
+            if not line.endswith(b"\n"):
+                break
+            valid_size += len(line)
+            try:
+                record: Any = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "path" in record:
+                done_paths.add(str(record["path"]))
+        output_file.truncate(valid_size)
+
+    return done_paths
@@ -1,29 +1,36 @@
-import os
-from typing import Optional
+import io
+import sys
+import time
+from typing import Iterable, Optional
 
 from pdfixsdk import (
     GetPdfix,
     PdfDoc,
     Pdfix,
     PdfRect,
-    PdsArray,
-    PdsDictionary,
-    PdsObject,
     PdsStructElement,
-    PdsStructTree,
-    kSaveFull,
 )
+from PIL import Image
 from tqdm import tqdm
 
-from exceptions import (
-    PdfixFailedToOpenException,
-    PdfixFailedToSaveException,
-    PdfixInitializeException,
-    PdfixNoTagsException,
-)
+from caption_backend import get_caption_backend
+from captions_sidecar import write_captions_json
+from crop_filter import classify_crop, classify_figure_size
+from exceptions import PdfixInitializeException
+from memory_budget import MemoryBudget
 from page_renderer import render_part_of_page
-from utils_sdk import authorize_sdk, browse_tags_recursive
-from vision import generate_alt_text_description
+from settings import BackendSettings, CropFilterSettings, DecodingSettings
+from time_budget import TimeBudget
+from utils_sdk import (
+    FigureInfo,
+    authorize_sdk,
+    browse_tags_recursive,
+    get_figure_element,
+    iterate_figures,
+    open_tagged_document,
+    save_document,
+)
+from vision import CaptionBackend, load_rgb_image
 
 
 def generate_alt_texts_in_pdf(
@@ -34,19 +41,34 @@ def generate_alt_texts_in_pdf(
     overwrite: bool,
     zoom: float,
     model_path: str,
+    decoding: DecodingSettings,
+    batch_size: int,
+    max_memory: Optional[int],
+    backend: BackendSettings,
+    time_budget: Optional[float],
+    crop_filter: CropFilterSettings,
 ) -> None:
     """
     Run detect images and on those images run vission generate alt text.
 
     Args:
-        input_path (str): Input path to the PDF file.
-        output_path (str): Output path for saving the PDF file.
+        input_path (str): Input path to the PDF file or "-" to read it from stdin.
+        output_path (str): Output path for saving the PDF file or "-" to write it to stdout.
         license_name (str): Pdfix SDK license name.
         license_key (str): Pdfix SDK license key.
         overwrite (bool): Overwrite alternate text if already present.
         zoom (float): Zoom level for rendering the page.
         model_path (str): Path to Vision model. Default value is "model".
+        decoding (DecodingSettings): Settings of the alt text decoding.
+        batch_size (int): Number of images captioned at once.
+        max_memory (Optional[int]): Memory limit in bytes the processing adapts to. No limit if None.
+        backend (BackendSettings): Settings of the caption backend.
+        time_budget (Optional[float]): Seconds the processing has to finish in. Figures are ordered by value
+            and no new inference starts when estimated cost would not fit. No limit if None.
+        crop_filter (CropFilterSettings): Settings of the pre-filter skipping blank and decorative figures.
     """
+    deadline: TimeBudget = TimeBudget(time_budget)
+
     with tqdm(total=100) as progress_bar:
         progress_bar.set_description("Initializing")
 
@@ -57,114 +79,265 @@ def generate_alt_texts_in_pdf(
         authorize_sdk(pdfix, license_name, license_key)
 
         # Open doc
-        doc: Optional[PdfDoc] = pdfix.OpenDoc(input_path, "")
-        if doc is None:
-            raise PdfixFailedToOpenException(pdfix, input_path)
+        doc, struct_tree, child_element = open_tagged_document(pdfix, input_path)
 
-        struct_tree: Optional[PdsStructTree] = doc.GetStructTree()
-        if struct_tree is None:
-            raise PdfixNoTagsException(pdfix)
+        captions: list[tuple[FigureInfo, str]] = caption_document(
+            pdfix,
+            doc,
+            child_element,
+            overwrite,
+            zoom,
+            model_path,
+            decoding,
+            batch_size,
+            max_memory,
+            backend,
+            deadline,
+            crop_filter,
+            progress_bar,
+        )
 
-        root_object: Optional[PdsObject] = struct_tree.GetChildObject(0)
-        if root_object is None:
-            raise PdfixNoTagsException(pdfix)
-        child_element: Optional[PdsStructElement] = struct_tree.GetStructElementFromObject(root_object)
-        if child_element is None:
-            raise PdfixNoTagsException(pdfix)
+        for figure, alt_text_by_vission in captions:
+            elem: Optional[PdsStructElement] = get_figure_element(struct_tree, doc, figure.object_id)
+            if elem is not None:
+                elem.SetAlt(alt_text_by_vission)
 
-        progress_bar.update(10)
-        progress_bar.set_description("Processing elements")
+        progress_bar.n = 95
+        progress_bar.set_description("Saving document")
+        progress_bar.refresh()
 
-        try:
-            items: list[PdsStructElement] = browse_tags_recursive(child_element, "Figure")
+        save_document(pdfix, doc, output_path)
+        doc.Close()
 
-            if len(items) > 0:
-                step: float = float(80) / len(items)
+        progress_bar.n = 100
+        progress_bar.set_description("Done")
+        progress_bar.refresh()
 
-                for element in items:
-                    process_image(pdfix, element, doc, overwrite, zoom, model_path)
-                    progress_bar.update(step)
-        except Exception:
-            raise
+
+def extract_captions_from_pdf(
+    input_path: str,
+    output_path: str,
+    license_name: str,
+    license_key: str,
+    overwrite: bool,
+    zoom: float,
+    model_path: str,
+    decoding: DecodingSettings,
+    batch_size: int,
+    max_memory: Optional[int],
+    backend: BackendSettings,
+    time_budget: Optional[float],
+    crop_filter: CropFilterSettings,
+) -> None:
+    """
+    Run detect images and on those images run vission generate alt text, but instead of saving the PDF
+    write generated alt texts into JSON sidecar that can be applied later with `apply_captions_to_pdf`.
+
+    Args:
+        input_path (str): Input path to the PDF file or "-" to read it from stdin.
+        output_path (str): Output path for saving the JSON file.
+        license_name (str): Pdfix SDK license name.
+        license_key (str): Pdfix SDK license key.
+        overwrite (bool): Overwrite alternate text if already present.
+        zoom (float): Zoom level for rendering the page.
+        model_path (str): Path to Vision model. Default value is "model".
+        decoding (DecodingSettings): Settings of the alt text decoding.
+        batch_size (int): Number of images captioned at once.
+        max_memory (Optional[int]): Memory limit in bytes the processing adapts to. No limit if None.
+        backend (BackendSettings): Settings of the caption backend.
+        time_budget (Optional[float]): Seconds the processing has to finish in. Figures are ordered by value
+            and no new inference starts when estimated cost would not fit. No limit if None.
+        crop_filter (CropFilterSettings): Settings of the pre-filter skipping blank and decorative figures.
+    """
+    deadline: TimeBudget = TimeBudget(time_budget)
+
+    with tqdm(total=100) as progress_bar:
+        progress_bar.set_description("Initializing")
+
+        pdfix: Optional[Pdfix] = GetPdfix()
+        if pdfix is None:
+            raise PdfixInitializeException()
+
+        authorize_sdk(pdfix, license_name, license_key)
+
+        # Open doc
+        doc, _, child_element = open_tagged_document(pdfix, input_path)
+
+        captions: list[tuple[FigureInfo, str]] = caption_document(
+            pdfix,
+            doc,
+            child_element,
+            overwrite,
+            zoom,
+            model_path,
+            decoding,
+            batch_size,
+            max_memory,
+            backend,
+            deadline,
+            crop_filter,
+            progress_bar,
+        )
+        doc.Close()
 
         progress_bar.n = 95
-        progress_bar.set_description("Saving document")
+        progress_bar.set_description("Saving captions")
         progress_bar.refresh()
 
-        if not doc.Save(output_path, kSaveFull):
-            raise PdfixFailedToSaveException(pdfix, output_path)
+        write_captions_json(output_path, input_path, captions)
 
         progress_bar.n = 100
         progress_bar.set_description("Done")
         progress_bar.refresh()
 
 
-def process_image(
-    pdfix: Pdfix, elem: PdsStructElement, doc: PdfDoc, overwrite: bool, zoom: float, model_path: str
-) -> None:
+def caption_document(
+    pdfix: Pdfix,
+    doc: PdfDoc,
+    root_element: PdsStructElement,
+    overwrite: bool,
+    zoom: float,
+    model_path: str,
+    decoding: DecodingSettings,
+    batch_size: int,
+    max_memory: Optional[int],
+    backend: BackendSettings,
+    deadline: TimeBudget,
+    crop_filter: CropFilterSettings,
+    progress_bar: tqdm,
+) -> list[tuple[FigureInfo, str]]:
     """
-    For given image tag element generate alt text description using vision.
+    Render Figure tags of the document and generate alt texts for them.
 
     Args:
         pdfix (Pdfix): Pdfix SDK.
-        elem (PdsStructElement): Image element to generate alt text for.
         doc (PdfDoc): PDF document.
-        overwrite (bool): Should original alt text be overwritten?
+        root_element (PdsStructElement): Structure element to start browsing from.
+        overwrite (bool): Generate alt text also for figures that already have one.
         zoom (float): Zoom level for rendering the page.
         model_path (str): Path to Vision model. Default value is "model".
+        decoding (DecodingSettings): Settings of the alt text decoding.
+        batch_size (int): Number of images captioned at once.
+        max_memory (Optional[int]): Memory limit in bytes the processing adapts to. No limit if None.
+        backend (BackendSettings): Settings of the caption backend.
+        deadline (TimeBudget): Time budget of the processing.
+        crop_filter (CropFilterSettings): Settings of the pre-filter skipping blank and decorative figures.
+        progress_bar (tqdm): Progress bar advanced from 10 to 90 percent.
+
+    Returns:
+        Figures with generated alt texts.
     """
-    element_object: Optional[PdsObject] = elem.GetObject()
-    if element_object is None:
-        print("image element has no object")
-        return
-    image_name: str = f"image_{element_object.GetId()}.jpg"
+    captioner: CaptionBackend = get_caption_backend(model_path, decoding, backend)
+    budget: MemoryBudget = MemoryBudget(max_memory, batch_size)
+    budget.check()
+
+    progress_bar.update(10)
+    progress_bar.set_description("Processing elements")
+
+    figures: Iterable[FigureInfo] = iterate_figures(root_element, overwrite)
+    count: int
+    if deadline.deadline is not None:
+        # Most valuable figures first: missing alt text, then largest area
+        figures = sorted(figures, key=lambda figure: (figure.has_alt, -figure.area))
+        count = len(figures)
+    else:
+        # Count Figure tags first so figures can be streamed without holding all of them,
+        # tags are not inspected here so warnings about them are printed only once
+        count = sum(1 for _ in browse_tags_recursive(root_element, "Figure"))
+    captions: list[tuple[FigureInfo, str]] = []
+    uncaptioned: list[tuple[FigureInfo, str]] = []
+    skipped: dict[str, int] = {}
+
+    if count > 0:
+        step: float = float(80) / count
+        batch: list[tuple[FigureInfo, Image.Image]] = []
+
+        for figure in figures:
+            # Tiny figures are skipped before rendering, so they never pay for it
+            skip_reason: Optional[str] = classify_figure_size(figure.size, crop_filter) if crop_filter.enabled else None
+            if skip_reason is None:
+                if budget.exhausted:
+                    uncaptioned.append((figure, "memory limit"))
+                    progress_bar.update(step)
+                    continue
+                if not deadline.can_start(len(batch)):
+                    uncaptioned.append((figure, "time budget"))
+                    progress_bar.update(step)
+                    continue
+
+                start_time: float = time.monotonic()
+                image: Image.Image = render_figure(pdfix, doc, figure, zoom, budget.max_crop_pixels)
+                deadline.render.add(time.monotonic() - start_time)
+
+                if crop_filter.enabled:
+                    skip_reason = classify_crop(image, crop_filter)
+                if skip_reason is None:
+                    batch.append((figure, image))
+                    if len(batch) >= deadline.limit_batch_size(budget.batch_size):
+                        captions.extend(caption_figures(captioner, batch, deadline))
+                        progress_bar.update(step * len(batch))
+                        batch = []
+                        budget.check()
+                    continue
+
+            skipped[skip_reason] = skipped.get(skip_reason, 0) + 1
+            if crop_filter.placeholder:
+                captions.append((figure, crop_filter.placeholder))
+            else:
+                uncaptioned.append((figure, f"{skip_reason} image"))
+            progress_bar.update(step)
+
+        if len(batch) > 0:
+            captions.extend(caption_figures(captioner, batch, deadline))
+            progress_bar.update(step * len(batch))
+
+    if len(skipped) > 0:
+        counts: str = ", ".join(f"{count} {reason}" for reason, count in sorted(skipped.items()))
+        print(f"{sum(skipped.values())} images skipped without inference: {counts}", file=sys.stderr)
+    if len(uncaptioned) > 0:
+        print(f"{len(uncaptioned)} images left without alternate text:", file=sys.stderr)
+        for figure, reason in uncaptioned:
+            print(f"  [image_{figure.object_id}] page {figure.page_num + 1}: {reason}", file=sys.stderr)
 
-    # get image bbox from attributes
+    return captions
+
+
+def render_figure(pdfix: Pdfix, doc: PdfDoc, figure: FigureInfo, zoom: float, max_pixels: Optional[int]) -> Image.Image:
+    """
+    Render the image of the figure that alt text is generated from.
+
+    Args:
+        pdfix (Pdfix): Pdfix SDK.
+        doc (PdfDoc): PDF document.
+        figure (FigureInfo): Figure to render.
+        zoom (float): Zoom level for rendering the page.
+        max_pixels (Optional[int]): Maximum number of pixels of rendered image. No limit if None.
+
+    Returns:
+        Rendered image.
+    """
     bbox: PdfRect = PdfRect()
-    for i in range(0, elem.GetNumAttrObjects()):
-        attr_object: Optional[PdsObject] = elem.GetAttrObject(i)
-        if attr_object is None:
-            continue
-        attr: PdsDictionary = PdsDictionary(attr_object.obj)
-        arr: Optional[PdsArray] = attr.GetArray("BBox")
-        if not arr:
-            continue
-        bbox.left = arr.GetNumber(0)
-        bbox.bottom = arr.GetNumber(1)
-        bbox.right = arr.GetNumber(2)
-        bbox.top = arr.GetNumber(3)
-        break
-
-    # check bounding box
-    if bbox.left == bbox.right or bbox.top == bbox.bottom:
-        print(f"[{image_name}] image found but no BBox attribute was set")
-        return
-
-    # get the object page number (it may be written in child objects)
-    page_num: int = elem.GetPageNumber(0)
-    if page_num == -1:
-        for i in range(0, elem.GetNumChildren()):
-            page_num = elem.GetChildPageNumber(i)
-            if page_num != -1:
-                break
-    if page_num == -1:
-        print(f"[{image_name}] image found but can't determine the page number")
-        return
-
-    data: bytearray = render_part_of_page(pdfix, doc, page_num, bbox, zoom)
-    with open(image_name, "wb") as bf:
-        bf.write(data)
-
-    try:
-        # Use AI to get alt description
-        response: list[str] = generate_alt_text_description(image_name, model_path)
-
-        alt_text_by_vission: str = response[0]
-        original_alt_text: str = elem.GetAlt()
-
-        if overwrite or not original_alt_text:
-            elem.SetAlt(alt_text_by_vission)
-    except Exception:
-        raise
-    finally:
-        os.remove(image_name)
+    bbox.left, bbox.bottom, bbox.right, bbox.top = figure.bbox
+    data: bytearray = render_part_of_page(pdfix, doc, figure.page_num, bbox, zoom, max_pixels)
+    return load_rgb_image(io.BytesIO(data))
+
+
+def caption_figures(
+    captioner: CaptionBackend, batch: list[tuple[FigureInfo, Image.Image]], deadline: TimeBudget
+) -> list[tuple[FigureInfo, str]]:
+    """
+    Generate alt text descriptions for batch of rendered images using vision.
+
+    Args:
+        captioner (CaptionBackend): Caption backend.
+        batch (list[tuple[FigureInfo, Image.Image]]): Figures with their rendered images.
+        deadline (TimeBudget): Time budget collecting caption stage durations.
+
+    Returns:
+        Figures with generated alt texts.
+    """
+    start_time: float = time.monotonic()
+    alt_texts: list[str] = captioner.caption([image for _, image in batch])
+    deadline.add_caption(time.monotonic() - start_time, len(batch))
+
+    return [(figure, alt_text_by_vission) for (figure, _), alt_text_by_vission in zip(batch, alt_texts)]
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class DecodingSettings:
+    """
+    Settings of the autoregressive decoding.
+
+    Attributes:
+        max_length (int): Maximum length of generated alt text in tokens.
+        num_beams (int): Number of beams. Value 1 means greedy decoding.
+        static_cache (bool): Preallocate static KV cache that is reused between calls.
+        compile (bool): Compile decoder forward pass with torch.compile (requires static cache).
+    """
+
+    max_length: int = 16
+    num_beams: int = 1
+    static_cache: bool = True
+    compile: bool = False
+
+
+@dataclass(frozen=True)
+class BackendSettings:
+    """
+    Settings of the caption backend.
+
+    Attributes:
+        url (str): URL of remote caption server. In-process model is used if empty.
+        concurrency (int): Maximum number of concurrent requests and pooled connections.
+    """
+
+    url: str = ""
+    concurrency: int = 4
+
+
+@dataclass(frozen=True)
+class CropFilterSettings:
+    """
+    Settings of the pre-filter skipping blank and decorative figures before inference.
+
+    Attributes:
+        enabled (bool): Classify rendered crops and skip inference for blank and decorative ones.
+        min_size (float): Figures with shorter side below this size in PDF points are decorative.
+        min_std (float): Crops with standard deviation of gray levels below this value are blank.
+        min_edge_density (float): Crops with lower ratio of edge pixels inside the border are decorative
+            when they are also flat.
+        max_decorative_std (float): Crops are flat when standard deviation of gray levels inside the border
+            is below this value.
+        placeholder (str): Alt text set to skipped figures. They are left without alt text if empty.
+    """
+
+    enabled: bool = True
+    min_size: float = 8.0
+    min_std: float = 3.0
+    min_edge_density: float = 0.005
+    max_decorative_std: float = 16.0
+    placeholder: str = ""
@@ -0,0 +1,110 @@
+import time
+from typing import Optional
+
+
+class RunningAverage:
+    """
+    Running average of stage durations.
+    """
+
+    def __init__(self) -> None:
+        self.total: float = 0.0
+        self.count: int = 0
+
+    def add(self, seconds: float, items: int = 1) -> None:
+        """
+        Add measured duration of a stage that processed given number of items.
+
+        Args:
+            seconds (float): Measured duration.
+            items (int): Number of items processed in that time.
+        """
+        self.total += seconds
+        self.count += items
+
+    @property
+    def value(self) -> float:
+        """
+        Average duration per item, 0 while nothing was measured.
+
+        Returns:
+            Average duration in seconds.
+        """
+        return self.total / self.count if self.count > 0 else 0.0
+
+
+class TimeBudget:
+    """
+    Tracks processing deadline and estimates whether next figure fits into it.
+
+    Cost of a figure is estimated from running averages of render and caption stages. Part of the
+    budget is reserved for saving the document, so a valid PDF is written before the deadline.
+    """
+
+    # Constants
+    SAVE_RESERVE_RATIO: float = 0.05
+    SAVE_RESERVE_MIN_SECONDS: float = 1.0
+
+    def __init__(self, seconds: Optional[float]) -> None:
+        """
+        Start the clock.
+
+        Args:
+            seconds (Optional[float]): Time budget in seconds. No limit if None.
+        """
+        self.deadline: Optional[float] = None
+        self.save_reserve: float = 0.0
+        if seconds is not None:
+            self.deadline = time.monotonic() + seconds
+            self.save_reserve = max(seconds * self.SAVE_RESERVE_RATIO, self.SAVE_RESERVE_MIN_SECONDS)
+        self.render: RunningAverage = RunningAverage()
+        self.caption: RunningAverage = RunningAverage()
+        self.warmed_up: bool = False
+
+    def add_caption(self, seconds: float, items: int) -> None:
+        """
+        Add measured duration of caption stage.
+
+        The first call is left out of the estimate, it includes one-off warm-up of the model
+        (and compilation with `--compile`) that would inflate the estimate for many figures.
+
+        Args:
+            seconds (float): Measured duration.
+            items (int): Number of images captioned in that time.
+        """
+        if not self.warmed_up:
+            self.warmed_up = True
+            return
+        self.caption.add(seconds, items)
+
+    def limit_batch_size(self, batch_size: int) -> int:
+        """
+        Limit batch size until caption cost is known.
+
+        Figures are captioned one by one under a deadline until caption cost is measured, because `can_start`
+        can't estimate cost of a batch before that. The warm-up call is not measured, see `add_caption`.
+
+        Args:
+            batch_size (int): Requested number of images captioned at once.
+
+        Returns:
+            Number of images to caption at once.
+        """
+        if self.deadline is not None and self.caption.count == 0:
+            return 1
+        return batch_size
+
+    def can_start(self, pending: int) -> bool:
+        """
+        Check whether one more figure can be rendered and captioned before the deadline.
+
+        Args:
+            pending (int): Number of rendered figures waiting for captioning.
+
+        Returns:
+            True if estimated cost fits into remaining time.
+        """
+        if self.deadline is None:
+            return True
+        estimate: float = self.render.value + (pending + 1) * self.caption.value
+        return time.monotonic() + estimate + self.save_reserve <= self.deadline
@@ -1,17 +1,38 @@
+import ctypes
+import io
+import mmap
+import os
 import re
-from typing import Optional
+import stat
+import sys
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
 
 from pdfixsdk import (
+    PdfDoc,
     Pdfix,
+    PdfRect,
+    PdsArray,
+    PdsDictionary,
     PdsObject,
     PdsStructElement,
     PdsStructTree,
     PsAccountAuthorization,
+    PsMemoryStream,
     PsStandardAuthorization,
+    PsStream,
     kPdsStructChildElement,
+    kSaveFull,
 )
 
-from exceptions import PdfixActivationException, PdfixAuthorizationException
+from constants import STDIO_PATH, STREAM_CHUNK_SIZE
+from exceptions import (
+    PdfixActivationException,
+    PdfixAuthorizationException,
+    PdfixFailedToOpenException,
+    PdfixFailedToSaveException,
+    PdfixNoTagsException,
+)
 
 
 def authorize_sdk(pdfix: Pdfix, license_name: Optional[str], license_key: Optional[str]) -> None:
@@ -35,7 +56,165 @@ def authorize_sdk(pdfix: Pdfix, license_name: Optional[str], license_key: Option
         print("No license name or key provided. Using PDFix SDK trial")
 
 
-def browse_tags_recursive(element: PdsStructElement, regex_tag: str) -> list[PdsStructElement]:
+def open_tagged_document(pdfix: Pdfix, input_path: str) -> tuple[PdfDoc, PdsStructTree, PdsStructElement]:
+    """
+    Open PDF document and get its structure tree root element.
+
+    Args:
+        pdfix (Pdfix): Pdfix sdk instance.
+        input_path (str): Input path to the PDF file or "-" to read it from stdin.
+
+    Returns:
+        Tuple of opened document, its structure tree and first structure element.
+    """
+    doc: PdfDoc = open_document(pdfix, input_path)
+
+    struct_tree: Optional[PdsStructTree] = doc.GetStructTree()
+    if struct_tree is None:
+        raise PdfixNoTagsException(pdfix)
+
+    root_object: Optional[PdsObject] = struct_tree.GetChildObject(0)
+    if root_object is None:
+        raise PdfixNoTagsException(pdfix)
+    child_element: Optional[PdsStructElement] = struct_tree.GetStructElementFromObject(root_object)
+    if child_element is None:
+        raise PdfixNoTagsException(pdfix)
+
+    return doc, struct_tree, child_element
+
+
+def open_document(pdfix: Pdfix, input_path: str) -> PdfDoc:
+    """
+    Open PDF document from file or from stdin.
+
+    Args:
+        pdfix (Pdfix): Pdfix sdk instance.
+        input_path (str): Input path to the PDF file or "-" to read it from stdin.
+
+    Returns:
+        Opened document.
+    """
+    doc: Optional[PdfDoc]
+    if input_path == STDIO_PATH:
+        # The stream has to outlive the document, it is released with the process
+        doc = pdfix.OpenDocFromStream(read_into_memory_stream(pdfix, sys.stdin.fileno()), "")
+    else:
+        doc = pdfix.OpenDoc(input_path, "")
+    if doc is None:
+        raise PdfixFailedToOpenException(pdfix, input_path)
+    return doc
+
+
+class PdfStdout:
+    """
+    Original stdout reserved for writing the PDF when output is "-".
+    """
+
+    file: Optional[BinaryIO] = None
+
+    @classmethod
+    def reserve(cls) -> None:
+        """
+        Keep original stdout only for writing the PDF and redirect file descriptor 1 to stderr for the rest
+        of the run, so output of Python, native libraries and subprocesses can't corrupt the document.
+        """
+        sys.stdout.flush()
+        cls.file = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+
+def save_document(pdfix: Pdfix, doc: PdfDoc, output_path: str) -> None:
+    """
+    Save PDF document to file or to stdout.
+
+    Args:
+        pdfix (Pdfix): Pdfix sdk instance.
+        doc (PdfDoc): Document to save.
+        output_path (str): Output path for the PDF file or "-" to write it to stdout.
+    """
+    if output_path != STDIO_PATH:
+        if not doc.Save(output_path, kSaveFull):
+            raise PdfixFailedToSaveException(pdfix, output_path)
+        return
+
+    stream: Optional[PsMemoryStream] = pdfix.CreateMemStream()
+    if stream is None:
+        raise PdfixFailedToSaveException(pdfix, output_path)
+    try:
+        if not doc.SaveToStream(stream, kSaveFull):
+            raise PdfixFailedToSaveException(pdfix, output_path)
+        write_from_stream(pdfix, stream, PdfStdout.file or sys.stdout.buffer)
+    finally:
+        stream.Destroy()
+
+
+def read_into_memory_stream(pdfix: Pdfix, fd: int) -> PsMemoryStream:
+    """
+    Copy content of the file descriptor into Pdfix memory stream in chunks.
+
+    Regular files (e.g. stdin redirected from a file) are memory-mapped and copied straight from the mapping,
+    pipes are read into one reused buffer.
+
+    Args:
+        pdfix (Pdfix): Pdfix sdk instance.
+        fd (int): File descriptor opened for reading.
+
+    Returns:
+        Memory stream with the file content.
+    """
+    stream: Optional[PsMemoryStream] = pdfix.CreateMemStream()
+    if stream is None:
+        raise PdfixFailedToOpenException(pdfix, STDIO_PATH)
+
+    file_stat: os.stat_result = os.fstat(fd)
+    if stat.S_ISREG(file_stat.st_mode) and file_stat.st_size > 0:
+        # Copy-on-write mapping is writable for ctypes, but pages are never copied as they are only read
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_COPY) as mapped:
+            for offset in range(0, file_stat.st_size, STREAM_CHUNK_SIZE):
+                size: int = min(STREAM_CHUNK_SIZE, file_stat.st_size - offset)
+                chunk: ctypes.Array = (ctypes.c_ubyte * size).from_buffer(mapped, offset)
+                written: bool = stream.Write(offset, chunk, size)
+                # Mapping can't be closed while chunk refers to it
+                del chunk
+                if not written:
+                    raise PdfixFailedToOpenException(pdfix, STDIO_PATH)
+        return stream
+
+    buffer: ctypes.Array = (ctypes.c_ubyte * STREAM_CHUNK_SIZE)()
+    view: memoryview = memoryview(buffer).cast("B")
+    offset = 0
+    with io.FileIO(fd, "rb", closefd=False) as file:
+        while True:
+            size = file.readinto(view) or 0
+            if size == 0:
+                break
+            if not stream.Write(offset, buffer, size):
+                raise PdfixFailedToOpenException(pdfix, STDIO_PATH)
+            offset += size
+    return stream
+
+
+def write_from_stream(pdfix: Pdfix, stream: PsStream, file: BinaryIO) -> None:
+    """
+    Copy content of Pdfix stream into the file in chunks.
+
+    Args:
+        pdfix (Pdfix): Pdfix sdk instance.
+        stream (PsStream): Stream to copy.
+        file (BinaryIO): File opened for binary writing.
+    """
+    buffer: ctypes.Array = (ctypes.c_ubyte * STREAM_CHUNK_SIZE)()
+    view: memoryview = memoryview(buffer).cast("B")
+    total: int = stream.GetSize()
+    for offset in range(0, total, STREAM_CHUNK_SIZE):
+        size: int = min(STREAM_CHUNK_SIZE, total - offset)
+        if not stream.Read(offset, buffer, size):
+            raise PdfixFailedToSaveException(pdfix, STDIO_PATH)
+        file.write(view[:size])
+    file.flush()
+
+
+def browse_tags_recursive(element: PdsStructElement, regex_tag: str) -> Iterator[PdsStructElement]:
     """
     Recursively browses through the structure elements of a PDF document and processes
     elements that match the specified tags.
@@ -44,18 +223,21 @@ def browse_tags_recursive(element: PdsStructElement, regex_tag: str) -> list[Pds
     This function recursively browses through the structure elements of a PDF document
     starting from the specified parent element. It checks each child element to see if it
     matches the specified tags using a regular expression. If a match is found, the element
-    is processed using the `process_struct_elem` function. If no match is found, the function
-    calls itself recursively on the child element.
+    is yielded to the caller. If no match is found, the function calls itself recursively
+    on the child element. Elements are yielded as they are found so the whole list
+    is never held in memory.
 
     Args:
         element (PdsStructElement): The parent structure element to start browsing from.
         regex_tag (str): The regular expression to match tags.
+
+    Yields:
+        Matching structure elements in tree order.
     """
-    result: list[PdsStructElement] = []
     count: int = element.GetNumChildren()
     structure_tree: Optional[PdsStructTree] = element.GetStructTree()
     if not structure_tree:
-        return result
+        return
 
     for i in range(0, count):
         if element.GetChildType(i) != kPdsStructChildElement:
@@ -68,7 +250,135 @@ def browse_tags_recursive(element: PdsStructElement, regex_tag: str) -> list[Pds
             continue
         if re.match(regex_tag, child_element.GetType(True)) or re.match(regex_tag, child_element.GetType(False)):
             # process element
-            result.append(child_element)
+            yield child_element
         else:
-            result.extend(browse_tags_recursive(child_element, regex_tag))
-    return result
+            yield from browse_tags_recursive(child_element, regex_tag)
+
+
+@dataclass(frozen=True)
+class FigureInfo:
+    """
+    Figure tag that alt text is generated for.
+
+    Attributes:
+        object_id (int): Object id of the structure element.
+        page_num (int): Page number (0-based) the figure is on.
+        bbox (tuple[float, float, float, float]): Bounding box as left, bottom, right, top.
+        has_alt (bool): Whether the element already has alternate text.
+    """
+
+    object_id: int
+    page_num: int
+    bbox: tuple[float, float, float, float]
+    has_alt: bool
+
+    @property
+    def size(self) -> tuple[float, float]:
+        """
+        Size of the bounding box in PDF units.
+
+        Returns:
+            Width and height of the figure.
+        """
+        left, bottom, right, top = self.bbox
+        return abs(right - left), abs(top - bottom)
+
+    @property
+    def area(self) -> float:
+        """
+        Area of the bounding box in PDF units.
+
+        Returns:
+            Area of the figure.
+        """
+        width, height = self.size
+        return width * height
+
+
+def iterate_figures(root_element: PdsStructElement, overwrite: bool) -> Iterator[FigureInfo]:
+    """
+    Iterate over Figure tags alt text should be generated for.
+
+    Args:
+        root_element (PdsStructElement): Structure element to start browsing from.
+        overwrite (bool): Should original alt text be overwritten?
+
+    Yields:
+        Figures in tree order.
+    """
+    for element in browse_tags_recursive(root_element, "Figure"):
+        figure: Optional[FigureInfo] = get_figure_info(element)
+        # nothing to do when original alt text is kept
+        if figure is not None and (overwrite or not figure.has_alt):
+            yield figure
+
+
+def get_figure_info(elem: PdsStructElement) -> Optional[FigureInfo]:
+    """
+    For given image tag element find its bounding box and page.
+
+    Args:
+        elem (PdsStructElement): Image element to generate alt text for.
+
+    Returns:
+        Figure information or None if the element can't be rendered.
+    """
+    element_object: Optional[PdsObject] = elem.GetObject()
+    if element_object is None:
+        print("image element has no object")
+        return None
+    image_name: str = f"image_{element_object.GetId()}.jpg"
+
+    # get image bbox from attributes
+    bbox: PdfRect = PdfRect()
+    for i in range(0, elem.GetNumAttrObjects()):
+        attr_object: Optional[PdsObject] = elem.GetAttrObject(i)
+        if attr_object is None:
+            continue
+        attr: PdsDictionary = PdsDictionary(attr_object.obj)
+        arr: Optional[PdsArray] = attr.GetArray("BBox")
+        if not arr:
+            continue
+        bbox.left = arr.GetNumber(0)
+        bbox.bottom = arr.GetNumber(1)
+        bbox.right = arr.GetNumber(2)
+        bbox.top = arr.GetNumber(3)
+        break
+
+    # check bounding box
+    if bbox.left == bbox.right or bbox.top == bbox.bottom:
+        print(f"[{image_name}] image found but no BBox attribute was set")
+        return None
+
+    # get the object page number (it may be written in child objects)
+    page_num: int = elem.GetPageNumber(0)
+    if page_num == -1:
+        for i in range(0, elem.GetNumChildren()):
+            page_num = elem.GetChildPageNumber(i)
+            if page_num != -1:
+                break
+    if page_num == -1:
+        print(f"[{image_name}] image found but can't determine the page number")
+        return None
+
+    return FigureInfo(
+        element_object.GetId(), page_num, (bbox.left, bbox.bottom, bbox.right, bbox.top), bool(elem.GetAlt())
+    )
+
+
+def get_figure_element(struct_tree: PdsStructTree, doc: PdfDoc, object_id: int) -> Optional[PdsStructElement]:
+    """
+    Get structure element of the figure by its object id.
+
+    Args:
+        struct_tree (PdsStructTree): Structure tree of the document.
+        doc (PdfDoc): PDF document.
+        object_id (int): Object id of the structure element.
+
+    Returns:
+        Structure element or None if there is no such element.
+    """
+    element_object: Optional[PdsObject] = doc.GetObjectById(object_id)
+    if element_object is None:
+        return None
+    return struct_tree.GetStructElementFromObject(element_object)
@@ -1,45 +1,200 @@
-from typing import Any
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import IO, Any, Union
 
 import torch
 from PIL import Image
-from transformers import AutoTokenizer, BatchFeature, VisionEncoderDecoderModel, ViTImageProcessor
+from transformers import (
+    AutoTokenizer,
+    BatchFeature,
+    CompileConfig,
+    GenerationConfig,
+    VisionEncoderDecoderModel,
+    ViTImageProcessor,
+)
 
+from settings import DecodingSettings
 
-def generate_alt_text_description(image_path: str, model_path: str) -> list[str]:
+
+class CaptionBackend(ABC):
+    """
+    Interface of a backend that generates alt texts for images.
+    """
+
+    @property
+    @abstractmethod
+    def image_size(self) -> tuple[int, int]:
+        """
+        Size of images the model takes as input.
+
+        Returns:
+            Tuple of width and height in pixels.
+        """
+
+    @abstractmethod
+    def caption(self, images: list[Image.Image]) -> list[str]:
+        """
+        Generate alt texts for batch of images.
+
+        Args:
+            images (list[Image.Image]): Images in RGB mode.
+
+        Returns:
+            Alt text for each image in the same order.
+        """
+
+
+class VisionCaptioner(CaptionBackend):
+    """
+    Default in-process backend. Decoding engine that keeps the Vision model loaded and generates
+    alt texts for batches of images.
+
+    With static cache the key/value tensors are allocated once for given batch size and reused by
+    every following call, so decoding steps have fixed shapes and can be compiled. Every sequence
+    of the batch stops producing tokens after its end-of-sequence token and generation ends as soon
+    as all sequences (or all beams with early stopping) are finished.
     """
-    Generate alt text description using vission AI.
+
+    def __init__(self, model_path: str, settings: DecodingSettings) -> None:
+        """
+        Load model, image processor and tokenizer and prepare generation config.
+
+        Args:
+            model_path (str): Path to Vision model.
+            settings (DecodingSettings): Decoding settings.
+        """
+        self.settings: DecodingSettings = settings
+        model: Any = VisionEncoderDecoderModel.from_pretrained(model_path, local_files_only=True)
+        self.feature_extractor: ViTImageProcessor = ViTImageProcessor.from_pretrained(model_path, local_files_only=True)
+        self.tokenizer: Any = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+
+        # Select device and assign it
+        self.device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model.to(self.device)
+        model.eval()
+        self.model: Any = model
+
+        self.generation_config: GenerationConfig = self._create_generation_config()
+
+    def _create_generation_config(self) -> GenerationConfig:
+        """
+        Create generation config from model defaults and decoding settings.
+
+        Returns:
+            Generation config used for every generate call.
+        """
+        config: GenerationConfig = GenerationConfig.from_dict(self.model.generation_config.to_dict())
+        config.max_length = self.settings.max_length
+        config.num_beams = self.settings.num_beams
+        config.num_return_sequences = 1
+        config.do_sample = False
+        # Finish beam search as soon as there are enough finished candidates
+        config.early_stopping = self.settings.num_beams > 1
+        if config.pad_token_id is None:
+            config.pad_token_id = self.model.config.pad_token_id or config.eos_token_id
+
+        if self.settings.static_cache:
+            config.cache_implementation = "static"
+
+        config.disable_compile = not (self.settings.static_cache and self.settings.compile)
+        if not config.disable_compile:
+            compile_config: Any = CompileConfig(
+                fullgraph=True,
+                dynamic=False,
+                mode="reduce-overhead" if self.device.type == "cuda" else "default",
+            )
+            # Compile also on CPU when explicitly requested
+            compile_config._compile_all_devices = True
+            config.compile_config = compile_config
+
+        return config
+
+    @property
+    def image_size(self) -> tuple[int, int]:
+        """
+        Size of images the model takes as input.
+
+        Returns:
+            Tuple of width and height in pixels.
+        """
+        size: Any = self.feature_extractor.size
+        return int(size["width"]), int(size["height"])
+
+    def generate_ids(self, images: list[Image.Image]) -> torch.Tensor:
+        """
+        Run decoding for batch of images.
+
+        Args:
+            images (list[Image.Image]): Images in RGB mode.
+
+        Returns:
+            Generated token ids, one row per image.
+        """
+        pixel_values: BatchFeature = self.feature_extractor(images=images, return_tensors="pt").pixel_values
+        pixel_values = pixel_values.to(self.device)
+
+        with torch.inference_mode():
+            return self.model.generate(pixel_values, generation_config=self.generation_config)
+
+    def caption(self, images: list[Image.Image]) -> list[str]:
+        """
+        Generate alt texts for batch of images.
+
+        Args:
+            images (list[Image.Image]): Images in RGB mode.
+
+        Returns:
+            Alt text for each image in the same order.
+        """
+        output_ids: torch.Tensor = self.generate_ids(images)
+        preds: Any = self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+        return [str(pred).strip() for pred in preds]
+
+
+@lru_cache(maxsize=2)
+def get_vision_captioner(model_path: str, settings: DecodingSettings) -> VisionCaptioner:
+    """
+    Get decoding engine for given model, loading the model only on first use.
 
     Args:
-        image_path (str): Path to file containing image.
-        model_path (str): Path to Vision model. Default value is "model".
+        model_path (str): Path to Vision model.
+        settings (DecodingSettings): Decoding settings.
 
     Returns:
-        List of possible texts.
+        Loaded decoding engine.
     """
-    model: Any = VisionEncoderDecoderModel.from_pretrained(model_path, local_files_only=True)
-    feature_extractor: ViTImageProcessor = ViTImageProcessor.from_pretrained(model_path, local_files_only=True)
-    tokenizer: Any = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    return VisionCaptioner(model_path, settings)
 
-    # Select device and assign it
-    device: torch.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
 
-    # Generating settings
-    max_length: int = 16
-    num_beams: int = 1  # otherwise _reorder_cache() needs to be implemented
-    gen_kwargs: dict[str, int] = {"max_length": max_length, "num_beams": num_beams}
+def load_rgb_image(image_path: Union[str, IO[bytes]]) -> Image.Image:
+    """
+    Load image data and convert them to RGB.
+
+    Args:
+        image_path (Union[str, IO[bytes]]): Path to file or file object containing image.
 
-    # Load image data
+    Returns:
+        Image in RGB mode.
+    """
     image: Image.Image = Image.open(image_path)
     if image.mode != "RGB":
         image = image.convert(mode="RGB")
+    return image
 
-    pixel_values: BatchFeature = feature_extractor(images=image, return_tensors="pt").pixel_values
-    pixel_values = pixel_values.to(device)
 
-    # Generate alt texts
-    output_ids: Any = model.generate(pixel_values, **gen_kwargs)
-    preds: Any = tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+def load_resized_rgb_image(image_path: str, size: tuple[int, int]) -> Image.Image:
+    """
+    Load image data already resized to model input size.
+    JPEG images are decoded at reduced scale when possible, which is much faster for large photos.
 
-    # Return alt texts
-    return [str(pred).strip() for pred in preds]
+    Args:
+        image_path (str): Path to file containing image.
+        size (tuple[int, int]): Model input width and height.
+
+    Returns:
+        Image in RGB mode with given size.
+    """
+    with Image.open(image_path) as image:
+        image.draft("RGB", size)
+        rgb_image: Image.Image = image if image.mode == "RGB" else image.convert(mode="RGB")
+        return rgb_image.resize(size, Image.Resampling.BILINEAR)
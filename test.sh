@@ -72,6 +72,36 @@ else
     EXIT_STATUS=1
 fi
 
+info "Test #05: Run generate alternate text on image with remote caption backend (local stub server)"
+docker run --rm $PLATFORM -v $(pwd):/data -w /data --entrypoint /bin/sh $DOCKER_IMAGE -c \
+    "/usr/alt-desc/venv/bin/python3 /usr/alt-desc/src/caption_stub_server.py --port 8765 --fail 1 & sleep 2; \
+    /usr/alt-desc/venv/bin/python3 /usr/alt-desc/src/main.py generate-alt-text -i example/image_example.jpg -o $TEMPORARY_DIRECTORY/image_example_remote.txt --model /model --caption-url http://127.0.0.1:8765/" > /dev/null
+if grep -q "stub caption" "$(pwd)/$TEMPORARY_DIRECTORY/image_example_remote.txt" 2>/dev/null; then
+    success "passed"
+else
+    error "generate alternate text with remote caption backend failed on example/image_example.jpg"
+    EXIT_STATUS=1
+fi
+
+info "Test #06: Run extract captions and apply captions on tagged PDF"
+docker run --rm $PLATFORM -v $(pwd):/data -w /data $DOCKER_IMAGE extract-captions -i example/PDFUA-1.pdf -o $TEMPORARY_DIRECTORY/captions.json --model /model > /dev/null
+docker run --rm $PLATFORM -v $(pwd):/data -w /data $DOCKER_IMAGE apply-captions -i example/PDFUA-1.pdf --captions $TEMPORARY_DIRECTORY/captions.json -o $TEMPORARY_DIRECTORY/applied.pdf > /dev/null
+if [ -f "$(pwd)/$TEMPORARY_DIRECTORY/applied.pdf" ]; then
+    success "passed"
+else
+    error "extract and apply captions failed on example/PDFUA-1.pdf"
+    EXIT_STATUS=1
+fi
+
+info "Test #07: Run generate alternate text on tagged PDF streamed through stdin and stdout"
+docker run --rm -i $PLATFORM $DOCKER_IMAGE generate-alt-text -i - -o - --model /model < example/PDFUA-1.pdf > $TEMPORARY_DIRECTORY/streamed.pdf
+if head -c 5 "$(pwd)/$TEMPORARY_DIRECTORY/streamed.pdf" | grep -q "%PDF-"; then
+    success "passed"
+else
+    error "generate alternate text through stdin and stdout failed on example/PDFUA-1.pdf"
+    EXIT_STATUS=1
+fi
+
 # Move this to functional testing part
 
 # info "Test #04(fail test): Run update alternate text on PDF with no structure tree"
@@ -87,6 +117,10 @@ info "Cleaning up temporary files from tests"
 rm -f $TEMPORARY_DIRECTORY/config.json
 rm -f $TEMPORARY_DIRECTORY/passed.pdf
 rm -f $TEMPORARY_DIRECTORY/image_example.txt
+rm -f $TEMPORARY_DIRECTORY/image_example_remote.txt
+rm -f $TEMPORARY_DIRECTORY/captions.json
+rm -f $TEMPORARY_DIRECTORY/applied.pdf
+rm -f $TEMPORARY_DIRECTORY/streamed.pdf
 rmdir $(pwd)/$TEMPORARY_DIRECTORY
 
 info "Removing testing docker image"